@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -173,4 +173,70 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
\ No newline at end of file
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# SCRAPER
+# Browsers kept alive per worker process, and pages each serves before being relaunched
+SCRAPER_POOL_SIZE = config("SCRAPER_POOL_SIZE", default=3, cast=int)
+SCRAPER_RECYCLE_AFTER = config("SCRAPER_RECYCLE_AFTER", default=50, cast=int)
+# Seconds a multi-store comparison waits before reporting slower stores as failed
+SCRAPER_COMPARE_DEADLINE = config("SCRAPER_COMPARE_DEADLINE", default=45, cast=float)
+# Scrape result cache: seconds an entry stays fresh, entries kept per process, and an
+# optional CACHES alias (e.g. a DatabaseCache) shared by every worker
+SCRAPER_CACHE_TTL = config("SCRAPER_CACHE_TTL", default=3600, cast=int)
+SCRAPER_CACHE_SIZE = config("SCRAPER_CACHE_SIZE", default=512, cast=int)
+SCRAPER_CACHE_BACKEND = config("SCRAPER_CACHE_BACKEND", default="")
+# Seconds before a running scrape job is assumed abandoned by a dead worker
+SCRAPER_JOB_STALE_AFTER = config("SCRAPER_JOB_STALE_AFTER", default=300, cast=int)
+# Abort images, fonts, media and tracker requests while scraping (see storescrape.DEFAULT_BLOCKING)
+SCRAPER_BLOCK_REQUESTS = config("SCRAPER_BLOCK_REQUESTS", default=True, cast=bool)
+# Stores to try over plain HTTP first, falling back to the browser when no products are found
+SCRAPER_HTTP_STORES = config("SCRAPER_HTTP_STORES", default="", cast=Csv())
+# Base URL template replacing every store's site, used to point scrapers at recorded fixtures
+SCRAPER_BASE_URL_OVERRIDE = config("SCRAPER_BASE_URL_OVERRIDE", default="")
+# Keep every scrape's products as PriceObservation history (turned off when scraping fixtures)
+SCRAPER_RECORD_PRICES = config("SCRAPER_RECORD_PRICES", default=True, cast=bool)
+# Whole-receipt batch scrapes: browser contexts working in parallel per store, and seconds to wait overall
+SCRAPER_BATCH_CONCURRENCY = config("SCRAPER_BATCH_CONCURRENCY", default=2, cast=int)
+SCRAPER_BATCH_DEADLINE = config("SCRAPER_BATCH_DEADLINE", default=120, cast=float)
+# Seconds an identical search waits on one already in flight (across workers needs SCRAPER_CACHE_BACKEND)
+SCRAPER_COALESCE_TIMEOUT = config("SCRAPER_COALESCE_TIMEOUT", default=60, cast=float)
+# Per-store health: searches kept in the rolling window, failures needed before the circuit
+# opens (minimum calls and failure rate), seconds it stays open, and the lowest adaptive timeout in ms
+SCRAPER_HEALTH_WINDOW = config("SCRAPER_HEALTH_WINDOW", default=20, cast=int)
+SCRAPER_BREAKER_MIN_CALLS = config("SCRAPER_BREAKER_MIN_CALLS", default=5, cast=int)
+SCRAPER_BREAKER_FAILURE_RATE = config("SCRAPER_BREAKER_FAILURE_RATE", default=0.5, cast=float)
+SCRAPER_BREAKER_COOLDOWN = config("SCRAPER_BREAKER_COOLDOWN", default=60, cast=float)
+SCRAPER_MIN_TIMEOUT = config("SCRAPER_MIN_TIMEOUT", default=5000, cast=int)
+
+
+# RECEIPT INGESTION
+# Seconds before a receipt stuck in processing is assumed abandoned by a dead worker
+RECEIPT_PROCESSING_STALE_AFTER = config("RECEIPT_PROCESSING_STALE_AFTER", default=300, cast=int)
+# Bulk uploads: most files per request, uploads read at once per process, and receipts per insert
+RECEIPT_BULK_MAX_FILES = config("RECEIPT_BULK_MAX_FILES", default=25, cast=int)
+RECEIPT_BULK_CONCURRENCY = config("RECEIPT_BULK_CONCURRENCY", default=4, cast=int)
+RECEIPT_BULK_BATCH_SIZE = config("RECEIPT_BULK_BATCH_SIZE", default=20, cast=int)
+# Largest upload accepted; images are shrunk to OCR_MAX_PIXELS and OCR_MAX_BYTES before OCR
+RECEIPT_MAX_UPLOAD_BYTES = config("RECEIPT_MAX_UPLOAD_BYTES", default=20 * 1024 * 1024, cast=int)
+OCR_MAX_PIXELS = config("OCR_MAX_PIXELS", default=4_000_000, cast=int)
+OCR_MAX_BYTES = config("OCR_MAX_BYTES", default=900 * 1024, cast=int)
+# PDF and TIFF receipts: most pages accepted, and pages sent to OCR at once
+OCR_MAX_PAGES = config("OCR_MAX_PAGES", default=10, cast=int)
+OCR_PAGE_CONCURRENCY = config("OCR_PAGE_CONCURRENCY", default=4, cast=int)
+# OCR engine: ocrspace (hosted API), tesseract (local, needs the tesseract binary and pytesseract) or stub.
+# Tesseract runs in OCR_WORKERS processes (default one per core), each read limited to OCR_TIMEOUT seconds
+OCR_BACKEND = config("OCR_BACKEND", default="ocrspace")
+OCR_WORKERS = config("OCR_WORKERS", default=0, cast=int) or None
+OCR_TIMEOUT = config("OCR_TIMEOUT", default=60, cast=float)
+# ocr.space endpoint, overridable to point at a replay stand-in
+OCR_SPACE_URL = config("OCR_SPACE_URL", default="https://api.ocr.space/parse/image")
+# ocr.space client: seconds to connect and to wait for a response, retries after a timeout,
+# connection error or 5xx, and the base backoff in seconds (doubled per attempt, with full jitter)
+OCR_CONNECT_TIMEOUT = config("OCR_CONNECT_TIMEOUT", default=5, cast=float)
+OCR_READ_TIMEOUT = config("OCR_READ_TIMEOUT", default=30, cast=float)
+OCR_RETRIES = config("OCR_RETRIES", default=2, cast=int)
+OCR_RETRY_BACKOFF = config("OCR_RETRY_BACKOFF", default=0.5, cast=float)
+# OCR results cached by upload hash: entries kept, and days an unused entry survives
+OCR_CACHE_MAX_ENTRIES = config("OCR_CACHE_MAX_ENTRIES", default=5000, cast=int)
+OCR_CACHE_MAX_AGE_DAYS = config("OCR_CACHE_MAX_AGE_DAYS", default=30, cast=int)
@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import CustomUser, Receipt, Item
+from .models import CustomUser, Receipt, Item, ScrapeJob, PriceObservation
 
 # Register your models here.
 admin.site.register(CustomUser)
 admin.site.register(Receipt)
-admin.site.register(Item)
\ No newline at end of file
+admin.site.register(Item)
+admin.site.register(ScrapeJob)
+admin.site.register(PriceObservation)
\ No newline at end of file
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+class StoreStandInHandler(BaseHTTPRequestHandler):
+    """
+    Serves the recorded search page for /<store>/<anything>, so a scraper whose base
+    URL is http://host:port/<store> gets its store's fixture for any search.
+    """
+
+    def do_GET(self):
+        store = self.path.lstrip("/").split("/", 1)[0].split("?", 1)[0]
+        fixture = FIXTURES_DIR / "stores" / f"{store}.html"
+
+        if "/static/" in self.path:
+            self._send(200, "text/css", b"")
+        elif fixture.is_file():
+            self._send(200, "text/html; charset=utf-8", fixture.read_bytes())
+        else:
+            self._send(404, "text/plain", b"Not found")
+
+    def _send(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OcrReplayHandler(BaseHTTPRequestHandler):
+    """
+    Answers ocr.space requests with recorded responses, picked by the sha256 of the uploaded
+    file. Fill responses before starting the server; delay adds seconds to every answer.
+    """
+
+    responses = {}
+    delay = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        message = BytesParser(policy=default).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        upload = next((part.get_content() for part in message.iter_parts() if part.get_filename()), b"")
+
+        response = self.responses.get(hashlib.sha256(upload).hexdigest())
+        if response is None:
+            response = {"OCRExitCode": 99, "IsErroredOnProcessing": True, "ErrorMessage": ["No recorded response for this file."]}
+
+        time.sleep(self.delay)
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer:
+    """Runs a stand-in HTTP server on a background thread; port 0 picks a free port"""
+
+    def __init__(self, handler, host="127.0.0.1", port=0):
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
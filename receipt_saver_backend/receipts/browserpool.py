@@ -0,0 +1,155 @@
+import atexit
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from playwright.sync_api import sync_playwright
+
+
+class BrowserWorker(threading.Thread):
+    """
+    Owns one Playwright instance and one Chromium process for the life of the
+    worker process. Playwright's sync API is bound to the thread that started
+    it, so every job that touches this browser runs on this thread.
+    """
+
+    def __init__(self, jobs, recycle_after, launch_options):
+        super().__init__(daemon=True)
+        self.jobs = jobs
+        self.recycle_after = recycle_after
+        self.launch_options = launch_options
+        self.playwright = None
+        self.browser = None
+        self.pages_served = 0
+        self.launches = 0
+        self.crashes = 0
+
+    def run(self):
+        with sync_playwright() as p:
+            self.playwright = p
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+
+                fn, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                try:
+                    context = self._get_browser().new_context()
+                    context.on("page", self._count_page)
+                    try:
+                        future.set_result(fn(context))
+                    finally:
+                        self._close_quietly(context)
+                except BaseException as e:
+                    future.set_exception(e)
+
+                if self.browser is not None and not self.browser.is_connected():
+                    self.crashes += 1
+                    self.browser = None
+                elif self.pages_served >= self.recycle_after:
+                    self._close_browser()
+
+            self._close_browser()
+
+    def _get_browser(self):
+        # Replace the browser if it was never started, was recycled or crashed
+        if self.browser is None or not self.browser.is_connected():
+            self.browser = self.playwright.chromium.launch(**self.launch_options)
+            self.pages_served = 0
+            self.launches += 1
+        return self.browser
+
+    def _count_page(self, page):
+        self.pages_served += 1
+
+    def _close_browser(self):
+        if self.browser is not None:
+            self._close_quietly(self.browser)
+            self.browser = None
+
+    def _close_quietly(self, target):
+        try:
+            target.close()
+        except Exception as e:
+            print(f"Error closing browser resource: {e}")
+
+
+class BrowserPool:
+    """
+    Fixed-size pool of long-lived Chromium browsers. Callers submit a function
+    taking a fresh BrowserContext; the context is closed once it returns.
+    """
+
+    def __init__(self, size=2, recycle_after=50, launch_options=None):
+        self.size = max(1, size)
+        self.recycle_after = max(1, recycle_after)
+        self.launch_options = launch_options or {"headless": True}
+        self.jobs = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def _start(self):
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Browser pool has been shut down.")
+            # Replace workers whose thread died, e.g. because Playwright failed to start
+            self.workers = [worker for worker in self.workers if worker.is_alive()]
+            while len(self.workers) < self.size:
+                worker = BrowserWorker(self.jobs, self.recycle_after, self.launch_options)
+                worker.start()
+                self.workers.append(worker)
+
+    def submit(self, fn) -> Future:
+        self._start()
+        future = Future()
+        self.jobs.put((fn, future))
+        return future
+
+    def run(self, fn, timeout=None):
+        future = self.submit(fn)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # Drop the job if it hasn't started, so nobody's abandoned search still runs later
+            future.cancel()
+            raise
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "queued": self.jobs.qsize(),
+            "launches": sum(worker.launches for worker in self.workers),
+            "crashes": sum(worker.crashes for worker in self.workers),
+        }
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            for _ in self.workers:
+                self.jobs.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.join(timeout=10)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    # Created lazily so each gunicorn worker starts its own browsers after fork
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                size=settings.SCRAPER_POOL_SIZE,
+                recycle_after=settings.SCRAPER_RECYCLE_AFTER,
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,157 @@
+import json
+import threading
+from collections import deque
+
+import requests
+from lxml import html as lxml_html
+from lxml.etree import ParserError
+from requests.adapters import HTTPAdapter
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# Keys product objects commonly use in embedded page data
+NAME_KEYS = ("name", "title", "productName", "product_name")
+PRICE_KEYS = ("price", "currentPrice", "current_price", "salePrice", "priceString", "displayPrice", "formattedPrice")
+PRICE_VALUE_KEYS = ("formatted", "formattedValue", "value", "amount", "price", "current_retail", "currentPrice")
+URL_KEYS = ("url", "canonicalUrl", "productUrl", "href", "link")
+IMAGE_KEYS = ("image", "imageUrl", "image_url", "thumbnailUrl", "thumbnail")
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Shared keep-alive session so repeat lookups reuse connections to each store"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def fetch(url, timeout):
+    response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+def parse_cards(content, config, limit=10):
+    """
+    Pull raw product cards ({name, price, href, image}) out of a search page without a
+    browser. Tries JSON-LD, then Next.js __NEXT_DATA__, then the store's CSS selectors.
+    """
+    try:
+        document = lxml_html.fromstring(content)
+    except ParserError:
+        return []
+
+    for finder in (_json_ld_cards, _next_data_cards, _selector_cards):
+        cards = finder(document, config, limit)
+        if cards:
+            return cards
+    return []
+
+def _json_ld_cards(document, config, limit):
+    cards = []
+    for script in document.xpath('//script[@type="application/ld+json"]/text()'):
+        if len(cards) >= limit:
+            break
+        try:
+            data = json.loads(script)
+        except ValueError:
+            continue
+
+        # Breadth first, so products come out in page order, stopping once there are enough
+        stack = deque([data])
+        while stack and len(cards) < limit:
+            node = stack.popleft()
+            if isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, dict):
+                if node.get("@type") == "Product" and node.get("name"):
+                    offers = node.get("offers") or {}
+                    if isinstance(offers, list):
+                        offers = offers[0] if offers else {}
+                    if not isinstance(offers, dict):
+                        # Some pages put a bare price or URL here
+                        offers = {}
+                    price = offers.get("price", offers.get("lowPrice"))
+                    cards.append(_card(node.get("name"), price, node.get("url"), node.get("image")))
+                else:
+                    stack.extend(node.get("itemListElement", []))
+                    if isinstance(node.get("item"), dict):
+                        stack.append(node["item"])
+                    stack.extend(node.get("@graph", []))
+    return cards
+
+def _next_data_cards(document, config, limit):
+    scripts = document.xpath('//script[@id="__NEXT_DATA__"]/text()')
+    if not scripts:
+        return []
+    try:
+        data = json.loads(scripts[0])
+    except ValueError:
+        return []
+
+    cards = []
+    stack = deque([data])
+    while stack and len(cards) < limit:
+        node = stack.popleft()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            name = _first(node, NAME_KEYS)
+            price = _price(_first(node, PRICE_KEYS))
+            if isinstance(name, str) and price is not None:
+                cards.append(_card(name, price, _first(node, URL_KEYS), _first(node, IMAGE_KEYS)))
+            else:
+                stack.extend(node.values())
+    return cards
+
+def _selector_cards(document, config, limit):
+    cards = []
+    for element in document.cssselect(config["card"])[:limit]:
+        name_el = element.cssselect(config["name"])
+        price_el = element.cssselect(config["price"])
+        link_el = element.cssselect(config["link"])
+        image_el = element.cssselect("img")
+        cards.append({
+            "name": name_el[0].text_content().strip() if name_el else None,
+            "price": price_el[0].text_content() if price_el else None,
+            "href": link_el[0].get("href") if link_el else None,
+            "image": image_el[0].get("src") if image_el else None,
+        })
+    return cards
+
+def _first(node, keys):
+    for key in keys:
+        if node.get(key) not in (None, ""):
+            return node[key]
+    return None
+
+def _price(value):
+    # Prices are either plain values or nested objects such as {"value": 3.49, "currency": "USD"}
+    if isinstance(value, dict):
+        value = _first(value, PRICE_VALUE_KEYS)
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float, str)):
+        return value
+    return None
+
+def _card(name, price, url, image):
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get("url") or image.get("contentUrl")
+    return {
+        "name": str(name).strip(),
+        "price": None if price is None else str(price),
+        "href": url if isinstance(url, str) else None,
+        "image": image if isinstance(image, str) else None,
+    }
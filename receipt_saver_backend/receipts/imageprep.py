@@ -0,0 +1,94 @@
+import math
+from io import BytesIO
+
+import pypdfium2 as pdfium
+from django.conf import settings
+from PIL import Image, ImageOps, ImageSequence
+
+from .ocr import OcrError
+
+# Qualities tried in order until the JPEG fits the byte budget
+JPEG_QUALITIES = (85, 75, 65, 55, 45)
+
+def prepare_image(data:bytes):
+    """
+    Shrink an upload to what OCR needs: at most OCR_MAX_PIXELS pixels and OCR_MAX_BYTES
+    bytes, grayscale and upright. Small JPEG/PNG files are passed through untouched.
+    Returns (bytes, filename, mimetype).
+    """
+    max_pixels = settings.OCR_MAX_PIXELS
+    max_bytes = settings.OCR_MAX_BYTES
+
+    image = Image.open(BytesIO(data))
+    width, height = image.size
+
+    if len(data) <= max_bytes and width * height <= max_pixels and image.format in ("JPEG", "PNG"):
+        if image.format == "JPEG":
+            return data, "receipt.jpg", "image/jpeg"
+        return data, "receipt.png", "image/png"
+
+    # JPEG can decode straight to grayscale at 1/2, 1/4 or 1/8 scale, skipping most of the work
+    if image.format == "JPEG":
+        scale = math.sqrt(max_pixels / (width * height))
+        image.draft("L", (int(width * scale), int(height * scale)))
+
+    return _encode(ImageOps.exif_transpose(image))
+
+def prepare_pages(data:bytes):
+    """
+    Split a PDF or multi-page TIFF into pages, each shrunk like prepare_image, in page order.
+    Any other upload is a single page. Raises OcrError past OCR_MAX_PAGES pages.
+    """
+    if data[:5] == b"%PDF-":
+        return _pdf_pages(data)
+
+    image = Image.open(BytesIO(data))
+    if image.format != "TIFF" or getattr(image, "n_frames", 1) == 1:
+        return [prepare_image(data)]
+
+    _check_page_count(image.n_frames)
+    return [_encode(ImageOps.exif_transpose(frame)) for frame in ImageSequence.Iterator(image)]
+
+def _pdf_pages(data):
+    pdf = pdfium.PdfDocument(data)
+    try:
+        _check_page_count(len(pdf))
+        pages = []
+        for page in pdf:
+            # Render straight to the pixel budget, but never past 300 dpi (PDF units are 1/72 inch)
+            width, height = page.get_size()
+            scale = min(300 / 72, math.sqrt(settings.OCR_MAX_PIXELS / (width * height)))
+            pages.append(_encode(page.render(scale=scale, grayscale=True).to_pil()))
+            page.close()
+        return pages
+    finally:
+        pdf.close()
+
+def _check_page_count(count):
+    if count > settings.OCR_MAX_PAGES:
+        raise OcrError(f"Receipts can have at most {settings.OCR_MAX_PAGES} pages.")
+
+def _encode(image):
+    """Grayscale JPEG within OCR_MAX_PIXELS, at the best quality that fits OCR_MAX_BYTES"""
+    max_bytes = settings.OCR_MAX_BYTES
+    image = image.convert("L")
+    image = _fit_pixels(image, settings.OCR_MAX_PIXELS)
+
+    while True:
+        for quality in JPEG_QUALITIES:
+            buffer = BytesIO()
+            image.save(buffer, format="JPEG", quality=quality, optimize=True)
+            if buffer.tell() <= max_bytes:
+                return buffer.getvalue(), "receipt.jpg", "image/jpeg"
+
+        # Even the lowest quality is too big, so give up some resolution and try again
+        if min(image.size) <= 200:
+            return buffer.getvalue(), "receipt.jpg", "image/jpeg"
+        image = image.resize((int(image.width * 0.75), int(image.height * 0.75)), Image.Resampling.LANCZOS)
+
+def _fit_pixels(image, max_pixels):
+    width, height = image.size
+    if width * height <= max_pixels:
+        return image
+    scale = math.sqrt(max_pixels / (width * height))
+    return image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.Resampling.LANCZOS, reducing_gap=3.0)
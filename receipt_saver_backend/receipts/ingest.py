@@ -0,0 +1,197 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import CustomUser, Receipt, ReceiptUpload, Item
+from .methods import read_receipt
+from .receiptparser import ReceiptParser
+
+def lock_next_receipt_number(user):
+    """
+    The user's next receipt number, locking their row until the surrounding transaction ends so
+    concurrent uploads can't take the same numbers. Receipts using it must be created in that transaction.
+    """
+    CustomUser.objects.select_for_update().only("pk").get(pk=user.pk)
+    last_number = Receipt.objects.filter(user = user).order_by("-receipt_number").values_list("receipt_number", flat=True).first()
+    return (last_number or 0) + 1
+
+def create_pending_receipt(user, upload) -> Receipt:
+    """Store the upload with a placeholder receipt that a worker fills in once OCR is done"""
+    with transaction.atomic():
+        next_number = lock_next_receipt_number(user)
+
+        receipt = Receipt.objects.create(
+            user=user,
+            receipt_number=next_number,
+            name=f"Unnamed Receipt ({next_number})",
+            store="",
+            address="",
+            subtotal=0,
+            total=0,
+            tax=0,
+            taxpercent=0,
+            processing_state=Receipt.PENDING,
+        )
+        ReceiptUpload.objects.create(receipt=receipt, data=upload.read())
+
+        user.num_receipts = Receipt.objects.filter(user = user).count()
+        user.save(update_fields=["num_receipts"])
+    return receipt
+
+def _purchase_date(value):
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        return timezone.now()
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+def _receipt_fields(parsed):
+    return {
+        "store": parsed.store,
+        "address": parsed.address,
+        "date_purchased": _purchase_date(parsed.date_purchased),
+        "subtotal": parsed.subtotal,
+        "tax": parsed.tax,
+        "taxpercent": parsed.taxpercent,
+        "total": parsed.total,
+        "num_items": len(parsed.items),
+    }
+
+def _items(receipt, parsed):
+    return [
+        Item(receipt=receipt, item_number=number, name=item.name, quantity=item.quantity, price=item.price)
+        for number, item in enumerate(parsed.items, start=1)
+    ]
+
+def save_parsed_receipt(receipt, parsed):
+    """
+    Write a ParsedReceipt's fields and items onto a receipt being processed, in one transaction.
+    Returns False, writing nothing, if the receipt was deleted or is no longer processing.
+    """
+    fields = _receipt_fields(parsed)
+    with transaction.atomic():
+        # An update rather than save(), which would insert the row again if the user deleted it
+        updated = Receipt.objects.filter(pk=receipt.pk, processing_state=Receipt.PROCESSING).update(
+            processing_state=Receipt.DONE, processing_error="", last_updated=timezone.now(), **fields
+        )
+        if not updated:
+            return False
+        Item.objects.bulk_create(_items(receipt, parsed))
+        ReceiptUpload.objects.filter(receipt_id=receipt.pk).delete()
+
+    for field, value in fields.items():
+        setattr(receipt, field, value)
+    receipt.processing_state = Receipt.DONE
+    receipt.processing_error = ""
+    return True
+
+def save_parsed_receipts(user, parsed_receipts, batch_size=20):
+    """
+    Create finished receipts (and their items) from ParsedReceipts in one transaction, inserted
+    batch_size receipts at a time and numbered after the user's latest receipt. Returns the
+    receipts in input order.
+    """
+    receipts = []
+    with transaction.atomic():
+        next_number = lock_next_receipt_number(user)
+        for start in range(0, len(parsed_receipts), batch_size):
+            batch = parsed_receipts[start:start + batch_size]
+            batch_receipts = [
+                Receipt(
+                    user=user,
+                    receipt_number=number,
+                    name=f"Unnamed Receipt ({number})",
+                    processing_state=Receipt.DONE,
+                    **_receipt_fields(parsed),
+                )
+                for number, parsed in enumerate(batch, start=next_number + start)
+            ]
+
+            Receipt.objects.bulk_create(batch_receipts)
+            Item.objects.bulk_create([
+                item
+                for receipt, parsed in zip(batch_receipts, batch)
+                for item in _items(receipt, parsed)
+            ])
+            receipts.extend(batch_receipts)
+
+        user.num_receipts = Receipt.objects.filter(user = user).count()
+        user.save(update_fields=["num_receipts"])
+    return receipts
+
+def parse_upload(upload):
+    """OCR and parse one upload, returning (ParsedReceipt, None) or (None, error message)"""
+    try:
+        image_text = read_receipt(upload)
+        if not image_text["success"]:
+            return None, image_text.get("message", "Unable to convert image to text, please try again later.")
+        return ReceiptParser().parse(image_text["data"]), None
+    except Exception as e:
+        print("Unexpected error while parsing upload:", str(e))
+        return None, "Error while reading receipt."
+    finally:
+        # Runs on pool threads, which would otherwise each keep a database connection open
+        connection.close()
+
+# Uploads mostly wait on OCR, so threads are enough; shared so concurrent bulk requests stay bounded
+_parse_executor = ThreadPoolExecutor(max_workers=settings.RECEIPT_BULK_CONCURRENCY, thread_name_prefix="receipt-parse")
+
+def parse_uploads(uploads):
+    """Parse uploads concurrently, returning (ParsedReceipt, error) pairs in upload order"""
+    return list(_parse_executor.map(parse_upload, uploads))
+
+def _fail(receipt, message):
+    # Skips receipts the user deleted, or that stale cleanup already failed, while they were processed
+    with transaction.atomic():
+        Receipt.objects.filter(pk=receipt.pk, processing_state=Receipt.PROCESSING).update(
+            processing_state=Receipt.FAILED, processing_error=message, last_updated=timezone.now()
+        )
+        ReceiptUpload.objects.filter(receipt_id=receipt.pk).delete()
+    receipt.processing_state = Receipt.FAILED
+    receipt.processing_error = message
+
+def process_receipt(receipt):
+    """OCR an uploaded receipt, parse it and save the result"""
+    try:
+        data = ReceiptUpload.objects.filter(receipt_id=receipt.pk).values_list("data", flat=True).first()
+        if data is None:
+            _fail(receipt, "Error while reading receipt.")
+            return
+        image_text = read_receipt(BytesIO(data))
+
+        if not image_text["success"]:
+            _fail(receipt, image_text.get("message", "Unable to convert image to text, please try again later."))
+            return
+
+        save_parsed_receipt(receipt, ReceiptParser().parse(image_text["data"]))
+    except Exception as e:
+        print("Unexpected error while processing receipt:", str(e))
+        try:
+            _fail(receipt, "Error while reading receipt.")
+        except Exception as e:
+            # Left processing; fail_stale_receipts picks it up later
+            print("Unable to mark receipt as failed:", str(e))
+
+def claim_next_receipt():
+    """Atomically move the oldest pending receipt to processing, or return None if there are none"""
+    while True:
+        receipt_id = Receipt.objects.filter(processing_state=Receipt.PENDING).order_by("created_at").values_list("id", flat=True).first()
+        if receipt_id is None:
+            return None
+
+        claimed = Receipt.objects.filter(id=receipt_id, processing_state=Receipt.PENDING).update(
+            processing_state=Receipt.PROCESSING, last_updated=timezone.now()
+        )
+        if claimed:
+            return Receipt.objects.get(id=receipt_id)
+
+def fail_stale_receipts():
+    cutoff = timezone.now() - timedelta(seconds=settings.RECEIPT_PROCESSING_STALE_AFTER)
+    stale = Receipt.objects.filter(processing_state=Receipt.PROCESSING, last_updated__lt=cutoff)
+    with transaction.atomic():
+        ReceiptUpload.objects.filter(receipt__in=stale).delete()
+        return stale.update(processing_state=Receipt.FAILED, processing_error="Receipt worker stopped before finishing.")
@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import ScrapeJob
+from .storescrape import Scraper
+from .ingest import claim_next_receipt, process_receipt, fail_stale_receipts
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running, or return None if the queue is empty"""
+    while True:
+        job_id = ScrapeJob.objects.filter(status=ScrapeJob.QUEUED).order_by("created_at").values_list("id", flat=True).first()
+        if job_id is None:
+            return None
+
+        # Another worker may have claimed it between the select and the update
+        claimed = ScrapeJob.objects.filter(id=job_id, status=ScrapeJob.QUEUED).update(
+            status=ScrapeJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return ScrapeJob.objects.get(id=job_id)
+
+def run_job(job):
+    try:
+        result = Scraper(job.store, job.item).checkStore()
+    except Exception as e:
+        result = {"error": str(e)}
+
+    if isinstance(result, dict) and "error" in result:
+        job.status = ScrapeJob.FAILED
+        job.error = result["error"]
+    else:
+        job.status = ScrapeJob.DONE
+        job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+
+def fail_stale_jobs():
+    # Jobs left running by a worker that died will never finish on their own
+    cutoff = timezone.now() - timedelta(seconds=settings.SCRAPER_JOB_STALE_AFTER)
+    return ScrapeJob.objects.filter(status=ScrapeJob.RUNNING, started_at__lt=cutoff).update(
+        status=ScrapeJob.FAILED, error="Scrape worker stopped before finishing.", finished_at=timezone.now()
+    )
+
+def work(poll_interval=1.0, stop=None):
+    """Process pending receipts and queued scrape jobs until stop is set, sleeping while both are empty"""
+    while stop is None or not stop.is_set():
+        try:
+            close_old_connections()
+            fail_stale_jobs()
+            fail_stale_receipts()
+
+            receipt = claim_next_receipt()
+            if receipt is not None:
+                process_receipt(receipt)
+                continue
+
+            job = claim_next_job()
+            if job is not None:
+                run_job(job)
+                continue
+        except Exception as e:
+            # One bad iteration (usually a dropped database connection) mustn't stop the queue;
+            # anything claimed and left running is failed by the stale checks
+            print("Job worker error:", str(e))
+            close_old_connections()
+
+        time.sleep(poll_interval)
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from PIL import Image, ImageDraw
+from rest_framework.test import APIClient
+
+from ...benchmarks.standin import FIXTURES_DIR, OcrReplayHandler, StandInServer
+from ...ingest import claim_next_receipt, process_receipt
+from ...models import CustomUser, OcrResult, Receipt
+from ...ocr import OcrSpaceBackend, reset_ocr_backend
+from ...receiptparser import ReceiptParser
+from .benchscrapers import percentile
+
+FIELDS = ("store", "address", "date", "items", "totals")
+
+
+def load_corpus():
+    """(name, recorded ocr.space response, its lines, expected parse) for every recorded receipt"""
+    backend = OcrSpaceBackend()
+    corpus = []
+    for path in sorted((FIXTURES_DIR / "receipts").glob("*.ocr.json")):
+        name = path.name[:-len(".ocr.json")]
+        response = json.loads(path.read_text())
+        expected = json.loads((path.parent / f"{name}.json").read_text())
+        corpus.append((name, response, backend.parse_response(response), expected))
+    return corpus
+
+def item_key(name, quantity, price):
+    return (" ".join(name.casefold().split()), quantity, round(price, 2))
+
+def score(parsed, expected):
+    """Whether each field matches, None where the receipt has no expected value, plus items found"""
+    expected_items = [item_key(item["name"], item["quantity"], item["price"]) for item in expected["items"]]
+    parsed_items = [item_key(item.name, item.quantity, item.price) for item in parsed.items]
+
+    matches = {
+        "store": parsed.store.casefold() == expected["store"].casefold(),
+        "address": parsed.address.casefold() == expected["address"].casefold(),
+        # Receipts without a printed date have nothing to check; the parser falls back to now
+        "date": parsed.date_purchased[:10] == expected["date_purchased"] if expected["date_purchased"] else None,
+        "items": parsed_items == expected_items,
+        "totals": all(abs(getattr(parsed, field) - expected[field]) < 0.005 for field in ("subtotal", "tax", "total")),
+    }
+    found = sum((Counter(parsed_items) & Counter(expected_items)).values())
+    return matches, found, len(expected_items)
+
+def receipt_image(name):
+    # Any small PNG is sent to OCR as-is, so its hash picks the recorded response
+    image = Image.new("L", (400, 200), 255)
+    ImageDraw.Draw(image).text((10, 10), name, fill=0)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Benchmark ReceiptParser against recorded OCR responses, and receipt uploads against an OCR replay stand-in."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=200, help="Passes over the corpus when measuring parse throughput.")
+        parser.add_argument("--upload-runs", type=int, default=3, help="Uploads per receipt when measuring create_receipt.")
+        parser.add_argument("--ocr-delay", type=float, default=0.0, help="Seconds the OCR stand-in waits before answering.")
+        parser.add_argument("--skip-uploads", action="store_true", help="Only measure parsing, without a test database.")
+
+    def handle(self, *args, **options):
+        corpus = load_corpus()
+        if not corpus:
+            raise CommandError(f"No recorded receipts in {FIXTURES_DIR / 'receipts'}")
+
+        self.report_accuracy(corpus)
+        self.report_throughput(corpus, max(1, options["runs"]))
+        if not options["skip_uploads"]:
+            self.report_uploads(corpus, max(1, options["upload_runs"]), options["ocr_delay"])
+
+    def report_accuracy(self, corpus):
+        parser = ReceiptParser()
+        header = f"{'receipt':<20}{'lines':>6}" + "".join(f"{field:>9}" for field in FIELDS) + f"{'found':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+
+        results = {field: [] for field in FIELDS}
+        found_total = expected_total = 0
+        for name, _, lines, expected in corpus:
+            matches, found, expected_count = score(parser.parse(lines), expected)
+            found_total += found
+            expected_total += expected_count
+            for field in FIELDS:
+                if matches[field] is not None:
+                    results[field].append(matches[field])
+
+            marks = "".join(f"{'-' if matches[field] is None else 'ok' if matches[field] else 'WRONG':>9}" for field in FIELDS)
+            self.stdout.write(f"{name:<20}{len(lines):>6}{marks}{f'{found}/{expected_count}':>9}")
+
+        accuracy = "  ".join(f"{field} {sum(values) / len(values):.0%}" for field, values in results.items() if values)
+        self.stdout.write(f"Accuracy: {accuracy}  item recall {found_total / expected_total:.0%}")
+
+    def report_throughput(self, corpus, runs):
+        parser = ReceiptParser()
+        line_count = sum(len(lines) for _, _, lines, _ in corpus)
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            for _, _, lines, _ in corpus:
+                parser.parse(lines)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"Parse throughput: {runs * len(corpus) / elapsed:,.0f} receipts/s, "
+            f"{runs * line_count / elapsed:,.0f} lines/s ({runs} passes over {len(corpus)} receipts)"
+        )
+
+    def report_uploads(self, corpus, runs, delay):
+        images = {name: receipt_image(name) for name, _, _, _ in corpus}
+        OcrReplayHandler.responses = {
+            hashlib.sha256(images[name]).hexdigest(): response for name, response, _, _ in corpus
+        }
+        OcrReplayHandler.delay = delay
+        # The stand-in ignores the key, but the client reads one from the environment
+        os.environ.setdefault("OCR_API", "replay")
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with StandInServer(OcrReplayHandler) as standin, override_settings(
+                OCR_BACKEND="ocrspace",
+                OCR_SPACE_URL=standin.url,
+                OCR_RETRIES=0,
+                RATELIMIT_ENABLE=False,
+                ALLOWED_HOSTS=["testserver"],
+            ):
+                reset_ocr_backend()
+                accepted, finished = self.time_uploads(corpus, images, runs)
+        finally:
+            reset_ocr_backend()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.stdout.write(
+            f"create_receipt ({runs * len(corpus)} uploads, OCR delay {delay * 1000:.0f} ms): "
+            f"accepted p50 {percentile(accepted, 50):.1f} p95 {percentile(accepted, 95):.1f} ms, "
+            f"parsed and saved p50 {percentile(finished, 50):.1f} p95 {percentile(finished, 95):.1f} ms"
+        )
+
+    def time_uploads(self, corpus, images, runs):
+        """Upload every receipt and process it as the worker would, timing both steps"""
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user(username="benchmark", password="Benchmark-1"))
+
+        accepted = []
+        finished = []
+        for _ in range(runs):
+            for name, _, _, _ in corpus:
+                # Every upload should pay for OCR rather than hit the cache
+                OcrResult.objects.all().delete()
+
+                start = time.perf_counter()
+                response = client.post(
+                    "/api/createreceipt/",
+                    {"file": SimpleUploadedFile(f"{name}.png", images[name], content_type="image/png")},
+                    format="multipart",
+                )
+                accepted.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 202:
+                    raise CommandError(f"{name}: create_receipt answered {response.status_code} {response.data}")
+
+                process_receipt(claim_next_receipt())
+                finished.append((time.perf_counter() - start) * 1000)
+
+                receipt = Receipt.objects.get(receipt_uuid=response.data["receipt_uuid"])
+                if receipt.processing_state != Receipt.DONE:
+                    raise CommandError(f"{name}: receipt ended {receipt.processing_state}: {receipt.processing_error}")
+        return accepted, finished
@@ -0,0 +1,148 @@
+import json
+import math
+import os
+import resource
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from ...benchmarks.standin import FIXTURES_DIR, StandInServer, StoreStandInHandler
+from ...browserpool import get_browser_pool
+from ...storescrape import STORES, Scraper
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def process_tree_rss_kb(root_pid):
+    """Resident memory of a process and all its descendants (Chromium runs as children), Linux only"""
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return None
+
+    children = {}
+    rss = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            status = (entry / "status").read_text()
+        except OSError:
+            continue
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry.name))
+        for line in status.splitlines():
+            if line.startswith("VmRSS:"):
+                rss[int(entry.name)] = int(line.split()[1])
+
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+def expected_products(store, base_url):
+    with open(FIXTURES_DIR / "stores" / f"{store}.json") as f:
+        expected = json.load(f)
+    for product in expected:
+        product["url"] = product["url"].format(base_url=base_url)
+    return expected
+
+def mismatches(products, expected):
+    if not isinstance(products, list):
+        return [products.get("error", "Scrape failed")]
+    if len(products) != len(expected):
+        return [f"expected {len(expected)} products, got {len(products)}"]
+
+    problems = []
+    for got, want in zip(products, expected):
+        for field in ("name", "price", "url", "image_url"):
+            value = got[field]
+            value = str(value) if field == "price" and value is not None else value
+            if value != want[field]:
+                problems.append(f"{field}: expected {want[field]!r}, got {value!r}")
+    return problems
+
+
+class Command(BaseCommand):
+    help = "Benchmark the store scrapers against recorded fixtures served from a local stand-in."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Searches per store.")
+        parser.add_argument("--stores", default=",".join(STORES), help="Comma separated stores to benchmark.")
+        parser.add_argument("--engine", choices=["browser", "http"], default="browser", help="Scraping engine to measure.")
+        parser.add_argument("--no-blocking", action="store_true", help="Don't abort images, fonts and trackers.")
+
+    def handle(self, *args, **options):
+        stores = [store.strip() for store in options["stores"].split(",") if store.strip()]
+        unknown = [store for store in stores if store not in STORES]
+        if unknown:
+            raise CommandError(f"Unknown stores: {', '.join(unknown)}")
+        runs = max(1, options["runs"])
+
+        with StandInServer(StoreStandInHandler) as standin, override_settings(
+            SCRAPER_BASE_URL_OVERRIDE=standin.url + "/{store}",
+            SCRAPER_HTTP_STORES=stores if options["engine"] == "http" else [],
+            SCRAPER_BLOCK_REQUESTS=not options["no_blocking"],
+            # Fixture products aren't real prices, so keep them out of the price history
+            SCRAPER_RECORD_PRICES=False,
+        ):
+            self.stdout.write(f"Stand-in serving fixtures at {standin.url} ({options['engine']} engine, {runs} runs per store)")
+
+            if options["engine"] == "browser":
+                start = time.perf_counter()
+                get_browser_pool().run(lambda context: None)
+                startup_ms = (time.perf_counter() - start) * 1000
+                self.stdout.write(f"Browser startup: {startup_ms:.0f} ms")
+
+            failures = 0
+            header = f"{'store':<12}{'p50':>9}{'p95':>9}{'p99':>9}{'nav':>9}{'first':>9}{'extract':>9}  result"
+            self.stdout.write(header)
+            self.stdout.write("-" * len(header))
+
+            for store in stores:
+                expected = expected_products(store, standin.url + "/" + store)
+                totals = []
+                navigation = []
+                first_product = []
+                extraction = []
+                problems = []
+
+                for _ in range(runs):
+                    scraper = Scraper(store, "milk", use_cache=False)
+                    start = time.perf_counter()
+                    products = scraper.checkStore()
+                    totals.append((time.perf_counter() - start) * 1000)
+
+                    metrics = scraper.metrics or {}
+                    navigation.append(metrics.get("navigation_ms", 0))
+                    first_product.append(metrics.get("first_product_ms", 0))
+                    extraction.append(metrics.get("extraction_ms", 0))
+                    problems = problems or mismatches(products, expected)
+
+                failures += bool(problems)
+                self.stdout.write(
+                    f"{store:<12}{percentile(totals, 50):>9.1f}{percentile(totals, 95):>9.1f}{percentile(totals, 99):>9.1f}"
+                    f"{sum(navigation) / runs:>9.1f}{sum(first_product) / runs:>9.1f}{sum(extraction) / runs:>9.1f}"
+                    f"  {'ok' if not problems else 'MISMATCH'}"
+                )
+                for problem in problems[:5]:
+                    self.stdout.write(f"    {problem}")
+
+        self.stdout.write("Times are in ms; nav, first and extract are means.")
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tree_kb = process_tree_rss_kb(os.getpid())
+        self.stdout.write(f"Python peak RSS: {peak_kb / 1024:.1f} MB")
+        if tree_kb is not None:
+            self.stdout.write(f"Process tree RSS (including browsers): {tree_kb / 1024:.1f} MB")
+
+        if failures:
+            raise CommandError(f"{failures} store(s) returned products that don't match their fixtures.")
@@ -0,0 +1,76 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ...jobs import work
+from ...ocr import reset_ocr_backend
+
+
+def _exit(signum, frame):
+    raise SystemExit(0)
+
+def _work_process(poll_interval):
+    signal.signal(signal.SIGTERM, _exit)
+    try:
+        work(poll_interval=poll_interval)
+    finally:
+        # atexit doesn't run in multiprocessing children, so stop any OCR processes here
+        reset_ocr_backend()
+
+
+class Command(BaseCommand):
+    help = "Run background workers that process uploaded receipts and queued scrape jobs from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2, help="Number of worker processes to run.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        processes = max(1, options["processes"])
+        poll_interval = options["poll_interval"]
+
+        if processes == 1:
+            self.stdout.write("Starting job worker.")
+            work(poll_interval=poll_interval)
+            return
+
+        # Children must open their own database connections
+        connections.close_all()
+
+        # Not daemonic: daemonic processes can't start children, and the Tesseract backend
+        # runs its own process pool
+        def start():
+            worker = multiprocessing.Process(target=_work_process, args=(poll_interval,))
+            worker.start()
+            return worker
+
+        workers = [start() for _ in range(processes)]
+        self.stdout.write(f"Started {processes} job workers.")
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            while not stopping:
+                # A worker that died (crash, OOM kill) is replaced, so the queue keeps moving
+                for i, worker in enumerate(workers):
+                    if not stopping and not worker.is_alive():
+                        self.stderr.write(f"Job worker {worker.pid} exited with code {worker.exitcode}, restarting it.")
+                        worker.join()
+                        workers[i] = start()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop(None, None)
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0013_scrapelock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('store', models.CharField(max_length=50)),
+                ('query', models.CharField(max_length=100)),
+                ('product_name', models.CharField(max_length=255)),
+                ('price', models.FloatField(blank=True, null=True)),
+                ('url', models.CharField(blank=True, max_length=500)),
+                ('observed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store', 'query', '-observed_at'], name='priceobs_store_query_latest'), models.Index(fields=['query', 'observed_at'], name='priceobs_query_trend')],
+            },
+        ),
+    ]
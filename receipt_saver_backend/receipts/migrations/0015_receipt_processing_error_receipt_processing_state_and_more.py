@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0014_priceobservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='processing_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='processing_state',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='done', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='upload',
+            field=models.FileField(blank=True, null=True, upload_to='receipt_uploads/'),
+        ),
+    ]
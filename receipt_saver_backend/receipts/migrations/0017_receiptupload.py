@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0016_ocrresult'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='receipt',
+            name='upload',
+        ),
+        migrations.CreateModel(
+            name='ReceiptUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.BinaryField()),
+                ('receipt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_upload', to='receipts.receipt')),
+            ],
+        ),
+    ]
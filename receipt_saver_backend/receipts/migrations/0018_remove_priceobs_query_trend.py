@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipts', '0017_receiptupload'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='priceobservation',
+            name='priceobs_query_trend',
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User, AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
 import uuid
@@ -29,7 +30,26 @@ class Receipt(models.Model):
     taxpercent=models.FloatField()
     num_items = models.IntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
-    
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+    PROCESSING_STATES = [
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+    processing_state = models.CharField(max_length=10, choices=PROCESSING_STATES, default=DONE, db_index=True)
+    processing_error = models.TextField(blank=True, default="")
+
+
+class ReceiptUpload(models.Model):
+    # Pending uploads live in the database, since the worker may run on a different host (and disk) than the web process
+    receipt = models.OneToOneField(Receipt, on_delete=models.CASCADE, related_name="pending_upload")
+    data = models.BinaryField()
+
     
 class Item(models.Model):
     item_uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
@@ -41,6 +61,56 @@ class Item(models.Model):
     price = models.FloatField()
     stores_checked = models.JSONField(default=dict, blank=True, null=True)
     last_updated = models.DateTimeField(auto_now=True)
-    
 
 
+class ScrapeJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    job_uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    store = models.CharField(max_length=50)
+    item = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    result = models.JSONField(encoder=DjangoJSONEncoder, blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+
+class ScrapeLock(models.Model):
+    key = models.CharField(max_length=255, unique=True)
+    owner = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+
+
+class PriceObservation(models.Model):
+    store = models.CharField(max_length=50)
+    query = models.CharField(max_length=100)
+    product_name = models.CharField(max_length=255)
+    price = models.FloatField(blank=True, null=True)
+    url = models.CharField(max_length=500, blank=True)
+    observed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Latest prices for a (store, query) and its price history both read this index in order
+            models.Index(fields=["store", "query", "-observed_at"], name="priceobs_store_query_latest"),
+        ]
+
+
+class OcrResult(models.Model):
+    content_hash = models.CharField(max_length=64, unique=True)
+    lines = models.JSONField(default=list)
+    size = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
@@ -0,0 +1,287 @@
+import atexit
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from decouple import config
+from django.conf import settings
+
+
+class OcrError(Exception):
+    """No usable lines could be read from an upload; the message is shown to the user"""
+
+
+class OcrSpaceBackend:
+    """
+    The ocr.space HTTP API, one line per row of its text overlay. Uploads share one keep-alive
+    session; timeouts, connection errors and 5xx responses are retried with jittered backoff.
+    """
+
+    name = "ocrspace"
+    retry_statuses = (500, 502, 503, 504)
+
+    def __init__(self, url="https://api.ocr.space/parse/image", retries=2, backoff=0.5, connect_timeout=5, read_timeout=30, pool_size=16, window=200):
+        self.url = url
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.session = None
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.retried = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def _get_session(self):
+        with self.lock:
+            if self.session is None:
+                self.session = requests.Session()
+                self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+            return self.session
+
+    def _record(self, started, ok):
+        with self.lock:
+            self.calls += 1
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                self.failures += 1
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter keeps uploads that failed together from retrying in lockstep
+        with self.lock:
+            self.retried += 1
+        time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def _post(self, files, data):
+        session = self._get_session()
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                r = session.post(self.url, files=files, data=data, timeout=self.timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                self._record(started, False)
+                if attempt == self.retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                continue
+
+            self._record(started, r.status_code < 500)
+            if r.status_code in self.retry_statuses and attempt < self.retries:
+                self._sleep_before_retry(attempt)
+                continue
+            r.raise_for_status()
+            return r
+
+    def read(self, image_bytes, filename, mimetype):
+        payload = {
+                'apikey': config("OCR_API"),
+                'language': "eng",
+                'isTable': True,
+                }
+
+        r = self._post(files={'file': (filename, image_bytes, mimetype)}, data=payload)
+        return self.parse_response(json.loads(r.content.decode()))
+
+    def parse_response(self, content):
+        """Lines of an ocr.space JSON response, or OcrError with its message"""
+        if content['OCRExitCode'] == 1 or content['OCRExitCode'] == 2:
+            try:
+                return [line['LineText'] for line in content['ParsedResults'][0]['TextOverlay']['Lines']]
+            except (KeyError, IndexError, TypeError):
+                raise OcrError("Lines do not exist in image.")
+        message = content.get('ErrorMessage') or 'Unknown error'
+        # ocr.space sends a list of messages for some failures
+        raise OcrError(" ".join(message) if isinstance(message, list) else message)
+
+    def stats(self):
+        with self.lock:
+            ordered = sorted(self.latencies)
+            calls, retried, failures = self.calls, self.retried, self.failures
+
+        def percentile(pct):
+            return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)] if ordered else None
+
+        return {
+            "backend": self.name,
+            "calls": calls,
+            "retried": retried,
+            "failures": failures,
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+        }
+
+
+def _tesseract_lines(image_bytes, timeout):
+    # Runs in a pool process, so the imports stay out of the web workers
+    import pytesseract
+    from PIL import Image
+
+    # psm 6 reads the receipt as one block of rows, the same shape as ocr.space's table mode
+    try:
+        text = pytesseract.image_to_string(Image.open(BytesIO(image_bytes)), lang="eng", config="--psm 6", timeout=timeout)
+    except pytesseract.TesseractError:
+        raise
+    except RuntimeError:
+        # pytesseract kills a tesseract run that passes the timeout, freeing this pool process
+        raise OcrError("OCR request timed out")
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+class TesseractBackend:
+    """Local Tesseract, run in a bounded pool of processes so concurrent uploads use every core"""
+
+    name = "tesseract"
+    # Extra seconds to wait on a pool process, so tesseract's own timeout normally ends the read first
+    grace = 5
+
+    def __init__(self, workers=None, timeout=60):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.executor = None
+        self.lock = threading.Lock()
+        # One slot per pool process, so a submitted read starts at once and the timeout only
+        # covers OCR itself, not time spent queued behind other pages
+        self.slots = threading.BoundedSemaphore(self.workers)
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self.executor
+
+    def _reset(self, executor):
+        # A crashed worker breaks the whole pool; the next call starts a fresh one
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, image_bytes):
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(_tesseract_lines, image_bytes, self.timeout)
+        except BrokenProcessPool:
+            # A pool process died while idle (e.g. OOM-killed); start a new pool and try once more
+            self._reset(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(_tesseract_lines, image_bytes, self.timeout)
+
+    def read(self, image_bytes, filename, mimetype):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OcrError("OCR request timed out")
+        try:
+            executor, future = self._submit(image_bytes)
+        except BaseException:
+            self.slots.release()
+            raise
+        # Freed when the process is actually done, even if this caller stopped waiting
+        future.add_done_callback(lambda _: self.slots.release())
+
+        try:
+            lines = future.result(timeout=self.timeout + self.grace)
+        except FutureTimeoutError:
+            raise OcrError("OCR request timed out")
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise OcrError("Error while reading receipt.")
+        return lines
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        return {"backend": self.name, "workers": self.workers}
+
+
+class StubBackend:
+    """Returns fixed lines without reading the image, for tests and local development"""
+
+    name = "stub"
+
+    lines = [
+        "TRADER JOE'S",
+        "123 MAIN ST",
+        "NEW YORK, NY 10001",
+        "01/15/2024",
+        "BANANAS 0.99",
+        "MILK 3.49",
+        "SUBTOTAL 4.48",
+        "TAX 0.00",
+        "TOTAL 4.48",
+    ]
+
+    def read(self, image_bytes, filename, mimetype):
+        return list(self.lines)
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+# Pages only wait on the backend (the API, or Tesseract's own process pool), so threads are enough
+_page_executor = ThreadPoolExecutor(max_workers=settings.OCR_PAGE_CONCURRENCY, thread_name_prefix="ocr-page")
+
+def read_pages(backend, pages):
+    """
+    Read (bytes, filename, mimetype) pages concurrently and join their lines in page order.
+    Blank pages add no lines; OcrError only if no page had any text.
+    """
+    if len(pages) == 1:
+        lines = backend.read(*pages[0])
+    else:
+        lines = []
+        for page_lines in _page_executor.map(lambda page: backend.read(*page), pages):
+            lines.extend(page_lines)
+
+    if not lines:
+        raise OcrError("Lines do not exist in image.")
+    return lines
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_ocr_backend():
+    """The backend named by OCR_BACKEND: ocrspace, tesseract or stub"""
+    # Created lazily so each gunicorn worker starts its own OCR processes after fork
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = settings.OCR_BACKEND
+            if name == "ocrspace":
+                _backend = OcrSpaceBackend(
+                    url=settings.OCR_SPACE_URL,
+                    retries=settings.OCR_RETRIES,
+                    backoff=settings.OCR_RETRY_BACKOFF,
+                    connect_timeout=settings.OCR_CONNECT_TIMEOUT,
+                    read_timeout=settings.OCR_READ_TIMEOUT,
+                )
+            elif name == "tesseract":
+                _backend = TesseractBackend(workers=settings.OCR_WORKERS, timeout=settings.OCR_TIMEOUT)
+                atexit.register(_backend.shutdown)
+            elif name == "stub":
+                _backend = StubBackend()
+            else:
+                raise ValueError(f"Unknown OCR_BACKEND: {name}")
+        return _backend
+
+def reset_ocr_backend():
+    """Forget the current backend so the next read picks up changed OCR settings"""
+    global _backend
+    with _backend_lock:
+        backend, _backend = _backend, None
+    if isinstance(backend, TesseractBackend):
+        backend.shutdown()
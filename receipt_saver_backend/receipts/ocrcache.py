@@ -0,0 +1,48 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import OcrResult
+
+def content_hash(data:bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def get_cached_lines(digest):
+    """OCR lines previously read from identical bytes, or None"""
+    lines = OcrResult.objects.filter(content_hash=digest).values_list("lines", flat=True).first()
+    if lines is not None:
+        OcrResult.objects.filter(content_hash=digest).update(hits=F("hits") + 1, last_used=timezone.now())
+    return lines
+
+def cache_lines(digest, lines, size):
+    try:
+        OcrResult.objects.create(content_hash=digest, lines=lines, size=size)
+    except IntegrityError:
+        # The same upload was read concurrently and cached first by someone else
+        return
+    evict()
+
+def evict():
+    """Drop entries older than OCR_CACHE_MAX_AGE_DAYS, then the least recently used past OCR_CACHE_MAX_ENTRIES"""
+    cutoff = timezone.now() - timedelta(days=settings.OCR_CACHE_MAX_AGE_DAYS)
+    OcrResult.objects.filter(last_used__lt=cutoff).delete()
+
+    overflow_ids = list(OcrResult.objects.order_by("-last_used").values_list("id", flat=True)[settings.OCR_CACHE_MAX_ENTRIES:])
+    if overflow_ids:
+        OcrResult.objects.filter(id__in=overflow_ids).delete()
+
+def stats():
+    # Every stored entry cost one OCR call; every hit is one call saved
+    totals = OcrResult.objects.aggregate(entry_count=Count("id"), hit_count=Sum("hits"), saved=Sum(F("size") * F("hits")))
+    entries = totals["entry_count"]
+    hits = totals["hit_count"] or 0
+    return {
+        "entries": entries,
+        "hits": hits,
+        "hit_rate": hits / (hits + entries) if hits + entries else 0.0,
+        "saved_upload_bytes": totals["saved"] or 0,
+    }
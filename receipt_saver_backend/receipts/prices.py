@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import PriceObservation
+from .scrapecache import normalize_query
+
+def _query(item):
+    # Long searches are cut to fit the column, the same way when writing and reading
+    return normalize_query(item)[:PriceObservation._meta.get_field("query").max_length]
+
+def record_prices(store, item, products):
+    """Store one scrape's products as observations sharing a single timestamp"""
+    if not settings.SCRAPER_RECORD_PRICES:
+        return
+    observed_at = timezone.now()
+    query = _query(item)
+    try:
+        PriceObservation.objects.bulk_create([
+            PriceObservation(
+                store=store,
+                query=query,
+                product_name=product["name"][:255],
+                price=float(product["price"]) if product["price"] is not None else None,
+                url=(product["url"] or "")[:500],
+                observed_at=observed_at,
+            )
+            for product in products
+        ])
+    except Exception as e:
+        # History is best effort, the scrape result is still good without it
+        print(f"Error recording price observations: {e}")
+
+def latest_prices(store, item):
+    """Products from the most recent scrape of (store, item), or an empty list"""
+    observations = PriceObservation.objects.filter(store=store, query=_query(item))
+    latest = observations.order_by("-observed_at").values_list("observed_at", flat=True).first()
+    if latest is None:
+        return []
+    return list(observations.filter(observed_at=latest).values("product_name", "price", "url", "observed_at"))
+
+def price_history(store, item, days=30):
+    """Daily lowest and average price of (store, item) over the last number of days"""
+    since = timezone.now() - timedelta(days=days)
+    return list(
+        PriceObservation.objects
+        .filter(store=store, query=_query(item), observed_at__gte=since, price__isnull=False)
+        .annotate(day=TruncDate("observed_at"))
+        .values("day")
+        .annotate(lowest=Min("price"), average=Avg("price"), observations=Count("id"))
+        .order_by("day")
+    )
@@ -0,0 +1,210 @@
+# Standard library only, so receipts can be parsed without Django set up (e.g. in worker processes)
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List
+
+# Compiled once; the lists keep the order the patterns are tried in
+DATE_PATTERNS = [
+    re.compile(r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b', re.IGNORECASE),
+    re.compile(r'\b(\d{4}-\d{1,2}-\d{1,2})\b', re.IGNORECASE),
+]
+# Matched against all lines joined, since the month and day can be split across lines
+MONTH_DATE_PATTERN = re.compile(r'\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{2,4}\b', re.IGNORECASE)
+
+ITEM_PATTERNS = [
+    re.compile(r'^(.+?)\s+(\d+)\s*x?\s*\$?(\d+\.\d{2})\s*$', re.IGNORECASE),  # Item name, quantity, price
+    re.compile(r'^(.+?)\s+\$?(\d+\.\d{2})\s*$', re.IGNORECASE),  # Item name, price (quantity = 1)
+    re.compile(r'^(\d+)\s*x\s*(.+?)\s+\$?(\d+\.\d{2})\s*$', re.IGNORECASE),  # Quantity, item name, price
+]
+
+# Words that indicate non-item lines
+SKIP_WORDS = {
+    'total', 'subtotal', 'tax', 'change', 'cash', 'card', 'credit', 'debit',
+    'discount', 'coupon', 'thank', 'visit', 'receipt', 'phone', 'store',
+    'address', 'manager', 'cashier', 'transaction', 'balance'
+}
+SKIP_WORD_PATTERN = re.compile('|'.join(re.escape(word) for word in sorted(SKIP_WORDS)))
+
+DIGITS_ONLY = re.compile(r'^\d+$')
+PHONE_LIKE = re.compile(r'\d{3,}.*\d{3,}')
+ADDRESS_LIKE = re.compile(r'\d+.*[a-zA-Z]+.*\d+')
+STREET_LINE = re.compile(r'\d+.*[a-zA-Z].*(?:st|street|ave|avenue|rd|road|blvd|boulevard|dr|drive)', re.IGNORECASE)
+CITY_STATE_ZIP = re.compile(r'[a-zA-Z]+,\s*[A-Z]{2}\s*\d{5}')
+PRICE = re.compile(r'\$?(\d+\.\d{2})')
+PRICE_AND_AFTER = re.compile(r'\s*\$?\d+\.\d{2}.*$')
+LEADING_QUANTITY = re.compile(r'^(\d+)\s*x?\s*')
+LEADING_QUANTITY_STRIP = re.compile(r'^\d+\s*x?\s*')
+
+@dataclass(slots=True)
+class ParsedItem:
+    name: str
+    quantity: int
+    price: float
+
+
+@dataclass(slots=True)
+class ParsedReceipt:
+    store: str
+    address: str
+    date_purchased: str
+    subtotal: float
+    tax: float
+    total: float
+    items: List[ParsedItem] = field(default_factory=list)
+
+    @property
+    def taxpercent(self) -> float:
+        return self.tax / self.total if self.total != 0 else 0
+
+
+class ReceiptParser:
+    """
+    Reads store, address, date, items and totals from OCR lines in a single pass, looking
+    at each line once. The extract_* methods return one field each.
+    """
+
+    def parse(self, lines:List[str]) -> ParsedReceipt:
+        store = None
+        address_parts = []
+        date_matches = [None] * len(DATE_PATTERNS)
+        items = []
+        fallback_items = []
+        subtotal = 0.0
+        tax = 0.0
+        total = 0.0
+
+        for index, raw_line in enumerate(lines):
+            line = raw_line.strip()
+            lower = line.lower()
+
+            if store is None and index < 5 and len(line) > 2 and not DIGITS_ONLY.match(line):
+                # Skip lines that are just numbers, phone numbers or addresses
+                if not PHONE_LIKE.search(line) and not ADDRESS_LIKE.search(line):
+                    store = line
+
+            if index < 10 and (STREET_LINE.search(line) or CITY_STATE_ZIP.search(line)):
+                address_parts.append(line)
+
+            for position, found in enumerate(date_matches):
+                if found is None and ('/' in line or '-' in line):
+                    match = DATE_PATTERNS[position].search(line)
+                    if match:
+                        date_matches[position] = match.group(1)
+
+            # Totals
+            if 'subtotal' in lower:
+                price_match = PRICE.search(lower)
+                if price_match:
+                    subtotal += float(price_match.group(1))
+            elif 'tax' in lower or 'vat' in lower:
+                price_match = PRICE.search(lower)
+                if price_match:
+                    tax += float(price_match.group(1))
+            elif lower.startswith('total'):
+                price_match = PRICE.search(lower)
+                if price_match:
+                    total += float(price_match.group(1))
+
+            # Items
+            if not line or SKIP_WORD_PATTERN.search(lower):
+                continue
+
+            item = None
+            # Skip short and header-like (all caps, short) lines
+            if len(line) >= 3 and not (line.isupper() and len(line) < 30):
+                item = self._match_item(line)
+            if item is not None:
+                items.append(item)
+            elif not items:
+                # Only used if no line matches the item patterns, so kept as plain tuples until then
+                item = self._fallback_item(line)
+                if item is not None:
+                    fallback_items.append(item)
+
+        date_str = next((match for match in date_matches if match is not None), None)
+        if date_str is None:
+            month_match = MONTH_DATE_PATTERN.search(' '.join(lines))
+            date_str = month_match.group(1) if month_match else None
+
+        return ParsedReceipt(
+            store=store or "Unnamed Store",
+            address=' '.join(address_parts) if address_parts else "Address not found",
+            date_purchased=self._format_date(date_str) if date_str else datetime.now().isoformat(),
+            subtotal=subtotal,
+            tax=tax,
+            total=total,
+            items=[ParsedItem(name, quantity, price) for name, quantity, price in items or fallback_items],
+        )
+
+    def _match_item(self, line):
+        for position, pattern in enumerate(ITEM_PATTERNS):
+            match = pattern.match(line)
+            if match:
+                if position == 0:
+                    name, quantity_str, price_str = match.groups()
+                elif position == 1:
+                    name, price_str = match.groups()
+                    quantity_str = 1
+                else:
+                    quantity_str, name, price_str = match.groups()
+                return name.strip(), int(quantity_str), float(price_str)
+        return None
+
+    def _fallback_item(self, line):
+        # Any line with a price, named by everything before the price
+        price_match = PRICE.search(line)
+        if not price_match:
+            return None
+
+        name = PRICE_AND_AFTER.sub('', line).strip()
+        if not name or len(name) <= 1:
+            return None
+
+        # Look for quantity in the name
+        quantity_match = LEADING_QUANTITY.search(name)
+        if quantity_match:
+            quantity = int(quantity_match.group(1))
+            name = LEADING_QUANTITY_STRIP.sub('', name).strip()
+        else:
+            quantity = 1
+
+        return name, quantity, float(price_match.group(1))
+
+    def _format_date(self, date_str):
+        try:
+            # Try to parse and standardize the date
+            if '/' in date_str:
+                parsed_date = datetime.strptime(date_str, '%m/%d/%Y')
+            elif '-' in date_str and len(date_str) == 10:
+                parsed_date = datetime.strptime(date_str, '%Y-%m-%d')
+            else:
+                # For month names, try different formats
+                for fmt in ['%b %d, %Y', '%B %d, %Y', '%b %d %Y', '%B %d %Y']:
+                    try:
+                        parsed_date = datetime.strptime(date_str, fmt)
+                        break
+                    except:
+                        continue
+                else:
+                    return date_str  # Return as-is if can't parse
+
+            return parsed_date.isoformat()
+        except:
+            return date_str
+
+    def extract_store_name(self, lines:List[str]) -> str:
+        return self.parse(lines).store
+
+    def extract_address(self, lines:List[str]) -> str:
+        return self.parse(lines).address
+
+    def extract_date(self, lines:List[str]) -> str:
+        return self.parse(lines).date_purchased
+
+    def extract_items(self, lines:List[str]) -> List[ParsedItem]:
+        return self.parse(lines).items
+
+    def extract_totals(self, lines:List[str]) -> tuple[float, float, float]:
+        parsed = self.parse(lines)
+        return parsed.subtotal, parsed.tax, parsed.total
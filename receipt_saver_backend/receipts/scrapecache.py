@@ -0,0 +1,113 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+def normalize_query(text:str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so equivalent searches share a key"""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+def cache_key(store:str, item:str) -> str:
+    return f"scrape:{store}:{normalize_query(item).replace(' ', '_')}"
+
+
+class ScrapeCache:
+    """
+    In-process LRU of successful scrape results with a TTL. When a Django cache
+    alias is configured as the shared backend, entries are also written there so
+    every worker process can reuse each other's scrapes.
+    """
+
+    def __init__(self, ttl=3600, max_entries=512, backend=None):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.backend = caches[backend] if backend else None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, store, item):
+        key = cache_key(store, item)
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, products = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return list(products)
+                del self.entries[key]
+
+        products = self.get_shared(store, item)
+
+        with self.lock:
+            if products is None:
+                self.misses += 1
+            else:
+                self.shared_hits += 1
+        return products
+
+    def get_shared(self, store, item):
+        """Products from the shared backend only, kept locally until the shared entry expires"""
+        if self.backend is None:
+            return None
+        key = cache_key(store, item)
+        entry = self.backend.get(key)
+        # Entries carry their wall-clock expiry, so a copy never outlives the original scrape's TTL
+        if not isinstance(entry, dict) or entry["expires_at"] <= time.time():
+            return None
+
+        with self.lock:
+            self._store(key, entry["products"], time.monotonic() + entry["expires_at"] - time.time())
+        return list(entry["products"])
+
+    def set(self, store, item, products):
+        key = cache_key(store, item)
+        with self.lock:
+            self._store(key, products, time.monotonic() + self.ttl)
+        if self.backend is not None:
+            self.backend.set(key, {"products": list(products), "expires_at": time.time() + self.ttl}, timeout=self.ttl)
+
+    def _store(self, key, products, expires_at):
+        self.entries[key] = (expires_at, list(products))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_scrape_cache() -> ScrapeCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ScrapeCache(
+                ttl=settings.SCRAPER_CACHE_TTL,
+                max_entries=settings.SCRAPER_CACHE_SIZE,
+                backend=settings.SCRAPER_CACHE_BACKEND or None,
+            )
+        return _cache
@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
 
 from .models import CustomUser, Receipt, Item
+from .ingest import lock_next_receipt_number
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -45,20 +49,25 @@ class ReceiptSerializer(serializers.ModelSerializer):
     class Meta:
         model = Receipt
         fields = "__all__"
+        read_only_fields = ["processing_state", "processing_error"]
 
     def create(self, validated_data):
         items_data = validated_data.pop("items", [])
         user = self.context["request"].user
 
-        last_receipt = Receipt.objects.filter(user = user).order_by("-receipt_number").first()
-        next_number = last_receipt.receipt_number + 1 if last_receipt else 1
+        # Numbers and name suffixes are set before saving, so the query count doesn't grow with items
+        with transaction.atomic():
+            next_number = lock_next_receipt_number(user)
 
-        receipt = Receipt.objects.create(user=user, receipt_number=next_number, **validated_data)
-        receipt.name = receipt.name + f" ({next_number})"
-        receipt.save()
-        for item_data in items_data:
-            item = Item.objects.create(receipt=receipt, **item_data)
-            item.save()
+            name = validated_data.pop("name", "")
+            receipt = Receipt.objects.create(user=user, receipt_number=next_number, name=name + f" ({next_number})", **validated_data)
+
+            items = []
+            for number, item_data in enumerate(items_data, start=1):
+                item_data = {attr: value for attr, value in item_data.items() if attr not in ("id", "receipt")}
+                item_data["name"] = item_data.get("name", "") + f" ({number})"
+                items.append(Item(receipt=receipt, item_number=number, **item_data))
+            Item.objects.bulk_create(items)
 
         return receipt
     
@@ -66,32 +75,46 @@ class ReceiptSerializer(serializers.ModelSerializer):
         items_data = validated_data.pop("items", [])
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
-  
-        if items_data is not None:
+
+        # Query count stays the same however many items are sent
+        with transaction.atomic():
+            item_ids = [item_data["id"] for item_data in items_data if item_data.get("id")]
+            existing = instance.items.in_bulk(item_ids) if item_ids else {}
+
+            changed = {}
+            changed_fields = set()
+            new_items_data = []
             for item_data in items_data:
-                item_id = item_data.get("id")
-                if item_id:
-                    try:
-                        # Update existing item
-                        item_instance = instance.items.get(id=item_id)
-                        for attr, value in item_data.items():
-                            if attr != "id" and attr != "receipt":
-                                setattr(item_instance, attr, value)
-                        item_instance.save()
-                    except Item.DoesNotExist:
-                        # If item doesn't exist, create it
-                        item_data.pop("id", None)
-                        Item.objects.create(receipt=instance, **item_data)
-                else:
-                    # If no ID provided, create new item
-                    Item.objects.create(receipt=instance, **item_data)
-
-        if hasattr(instance, "subtotal") and hasattr(instance, "taxpercent"):
+                item_instance = existing.get(item_data.get("id"))
+                if item_instance is None:
+                    # Unknown or missing ID, create it
+                    new_items_data.append(item_data)
+                    continue
+                for attr, value in item_data.items():
+                    if attr != "id" and attr != "receipt":
+                        setattr(item_instance, attr, value)
+                        changed_fields.add(attr)
+                changed[item_instance.id] = item_instance
+
+            if changed:
+                # bulk_update skips auto_now, so stamp it like save() would
+                now = timezone.now()
+                for item_instance in changed.values():
+                    item_instance.last_updated = now
+                Item.objects.bulk_update(list(changed.values()), sorted(changed_fields | {"last_updated"}))
+
+            if new_items_data:
+                last_number = instance.items.aggregate(last=Max("item_number"))["last"] or 0
+                new_items = []
+                for number, item_data in enumerate(new_items_data, start=last_number + 1):
+                    item_data = {attr: value for attr, value in item_data.items() if attr not in ("id", "receipt")}
+                    item_data["name"] = item_data.get("name", "") + f" ({number})"
+                    new_items.append(Item(receipt=instance, item_number=number, **item_data))
+                Item.objects.bulk_create(new_items)
+
             instance.tax = instance.subtotal * instance.taxpercent /100.0
             instance.total = instance.subtotal + instance.tax
-            instance.save(update_fields=["tax", "total"])
-
+            instance.save()
 
         return instance
 
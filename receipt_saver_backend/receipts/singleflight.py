@@ -0,0 +1,110 @@
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ScrapeLock
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key inside one process: the first caller
+    runs the function and everyone who arrives while it runs gets the same result.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.led = 0
+        self.followed = 0
+
+    def do(self, key, fn, timeout=None):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+                self.led += 1
+            else:
+                self.followed += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight call {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self.lock:
+            return {"in_flight": len(self.calls), "led": self.led, "followed": self.followed}
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def _acquire(key, ttl):
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                ScrapeLock.objects.create(key=key, owner=_owner(), expires_at=expires_at)
+            return True
+        except IntegrityError:
+            # Clear a lock left behind by a worker that died, then try once more
+            if not ScrapeLock.objects.filter(key=key, expires_at__lt=timezone.now()).delete()[0]:
+                return False
+    return False
+
+def run_exclusive(key, fn, poll_result, timeout, poll_interval=0.25):
+    """
+    Run fn while holding a row in the ScrapeLock table so other worker processes don't
+    repeat the same work. If another worker holds the lock, poll_result() is polled
+    (normally a shared cache read) until it returns something, the lock is released or
+    the timeout passes; after that fn runs here.
+    """
+    if _acquire(key, timeout):
+        try:
+            return fn()
+        finally:
+            ScrapeLock.objects.filter(key=key, owner=_owner()).delete()
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = poll_result()
+        if result is not None:
+            return result
+        if not ScrapeLock.objects.filter(key=key).exists():
+            result = poll_result()
+            return result if result is not None else fn()
+        time.sleep(poll_interval)
+    return fn()
+
+
+_single_flight = SingleFlight()
+
+def get_single_flight() -> SingleFlight:
+    return _single_flight
@@ -0,0 +1,121 @@
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+class StoreHealth:
+    """
+    Rolling success rate and latency for one store, plus a circuit breaker. After enough
+    failures in the window the circuit opens and searches fail fast for the cooldown; then
+    a single probe is let through and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window=20, min_calls=5, failure_rate=0.5, cooldown=60,
+                 min_timeout=5000, max_timeout=30000, timeout_factor=2.0):
+        self.results = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_factor = timeout_factor
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.probing = False
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self.probing = False
+            if self.state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """Give back an allowed search that never ran, so a half-open circuit can send another probe"""
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.probing = False
+
+    def record(self, ok, latency_ms):
+        with self.lock:
+            self.results.append(ok)
+            if ok:
+                self.latencies.append(latency_ms)
+
+            if self.state == self.HALF_OPEN:
+                self.probing = False
+                if ok:
+                    self.state = self.CLOSED
+                    self.results.clear()
+                else:
+                    self._open()
+            elif self.state == self.CLOSED and len(self.results) >= self.min_calls and self._failure_rate() >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+    def _failure_rate(self):
+        return self.results.count(False) / len(self.results) if self.results else 0.0
+
+    def _p95(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def timeout_ms(self):
+        """Navigation timeout from observed p95 latency, or the maximum until there is enough data"""
+        with self.lock:
+            p95 = self._p95() if len(self.latencies) >= self.min_calls else None
+        if p95 is None:
+            return self.max_timeout
+        return int(min(self.max_timeout, max(self.min_timeout, p95 * self.timeout_factor)))
+
+    def stats(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "calls": len(self.results),
+                "failure_rate": self._failure_rate(),
+                "p95_ms": self._p95(),
+                "rejected": self.rejected,
+            }
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+def get_store_health(store) -> StoreHealth:
+    with _health_lock:
+        if store not in _health:
+            _health[store] = StoreHealth(
+                window=settings.SCRAPER_HEALTH_WINDOW,
+                min_calls=settings.SCRAPER_BREAKER_MIN_CALLS,
+                failure_rate=settings.SCRAPER_BREAKER_FAILURE_RATE,
+                cooldown=settings.SCRAPER_BREAKER_COOLDOWN,
+                min_timeout=settings.SCRAPER_MIN_TIMEOUT,
+            )
+        return _health[store]
+
+def health_summary():
+    with _health_lock:
+        stores = dict(_health)
+    return {store: {**health.stats(), "timeout_ms": health.timeout_ms()} for store, health in stores.items()}
@@ -1,12 +1,153 @@
 import re
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+import threading
+import time
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, TimeoutError as FutureTimeout
+from django.conf import settings
+from django.db import connection
+from playwright.sync_api import TimeoutError as PlaywrightTimeout
 from decimal import Decimal
 
+import requests
+
+from .browserpool import get_browser_pool
+from .httpscrape import fetch, parse_cards
+from .scrapecache import get_scrape_cache, cache_key
+from .singleflight import get_single_flight, run_exclusive
+from .storehealth import get_store_health
+from .prices import record_prices
+
+# Requests aborted during a search unless a store overrides them with its own "block" entry
+DEFAULT_BLOCKING = {
+    "resource_types": {"image", "media", "font"},
+    "hosts": (
+        "google-analytics.com", "googletagmanager.com", "googlesyndication.com", "doubleclick.net",
+        "facebook.net", "facebook.com", "hotjar.com", "optimizely.com", "segment.io", "segment.com",
+        "newrelic.com", "nr-data.net", "criteo.com", "criteo.net", "scorecardresearch.com",
+        "quantserve.com", "adobedtm.com", "omtrdc.net", "demdex.net", "bat.bing.com",
+        "analytics.tiktok.com", "pinterest.com", "branch.io", "quantummetric.com",
+    ),
+}
+
+# Per-store search page layout. "space" is how spaces are encoded in the query
+# and "require_price" drops product cards that don't show a price. A store can set
+# "engine": "http" to try a plain HTTP fetch before falling back to the browser.
+STORES = {
+    "target": {
+        "label": "Target",
+        "base_url": "https://www.target.com",
+        "search_path": "/s?searchTerm={query}",
+        "space": "+",
+        "ready": '[data-test="product-grid"]',
+        "card": '[data-test="@web/site-top-of-funnel/ProductCardWrapper"]',
+        "name": '[data-test="product-title"]',
+        "price": '[data-test="current-price"]',
+        "link": "a",
+        "require_price": True,
+    },
+    "walmart": {
+        "label": "Walmart",
+        "base_url": "https://www.walmart.com",
+        "search_path": "/search?q={query}",
+        "space": "+",
+        "ready": '[data-testid="list-view"]',
+        "card": "[data-item-id]",
+        "name": '[data-automation-id="product-title"]',
+        "price": '[data-automation-id="product-price"] span',
+        "link": "a[link-identifier]",
+        "require_price": True,
+    },
+    "aldi": {
+        "label": "Aldi",
+        "base_url": "https://www.aldi.us",
+        "search_path": "/en/products/search/?q={query}",
+        "space": "+",
+        "ready": ".product-tile",
+        "card": ".product-tile",
+        "name": ".product-tile__name",
+        "price": ".product-tile__price",
+        "link": "a",
+        "require_price": False,
+    },
+    "albertsons": {
+        "label": "Albertsons",
+        "base_url": "https://www.albertsons.com",
+        "search_path": "/shop/search-results.html?q={query}",
+        "space": "%20",
+        "ready": ".product-item",
+        "card": ".product-item",
+        "name": ".product-title",
+        "price": ".product-price",
+        "link": "a.product-link",
+        "require_price": False,
+    },
+    "staterbros": {
+        "label": "Stater Bros",
+        "base_url": "https://www.staterbros.com",
+        "search_path": "/search?searchTerm={query}",
+        "space": "+",
+        "ready": ".product-card",
+        "card": ".product-card",
+        "name": ".product-name",
+        "price": ".product-price",
+        "link": "a",
+        "require_price": False,
+    },
+    "sprouts": {
+        "label": "Sprouts",
+        "base_url": "https://shop.sprouts.com",
+        "search_path": "/search?search_term={query}",
+        "space": "%20",
+        "ready": '[data-testid="product-tile"]',
+        "card": '[data-testid="product-tile"]',
+        "name": '[data-testid="product-name"]',
+        "price": '[data-testid="product-price"]',
+        "link": "a",
+        "require_price": False,
+    },
+    "costco": {
+        "label": "Costco",
+        "base_url": "https://www.costco.com",
+        "search_path": "/CatalogSearch?keyword={query}",
+        "space": "+",
+        "ready": ".product",
+        "card": ".product",
+        "name": ".description",
+        "price": ".price",
+        "link": "a",
+        "require_price": False,
+        "block": {
+            "resource_types": {"image", "media", "font", "stylesheet"},
+            "hosts": DEFAULT_BLOCKING["hosts"],
+        },
+    },
+}
+
+# Runs in the page against every product card matching STORES[store]["card"]
+EXTRACT_PRODUCTS_JS = """
+(cards, fields) => cards.slice(0, fields.limit).map((card) => {
+    const name = card.querySelector(fields.name);
+    const price = card.querySelector(fields.price);
+    const link = card.querySelector(fields.link);
+    const image = card.querySelector("img");
+    return {
+        name: name ? name.innerText.trim() : null,
+        price: price ? price.innerText : null,
+        href: link ? link.getAttribute("href") : null,
+        image: image ? image.getAttribute("src") : null,
+    };
+})
+"""
+
 class Scraper:
-    def __init__(self, store_name, item_name):
+    def __init__(self, store_name, item_name, use_cache=True):
         self.store = store_name
         self.item = item_name
+        self.use_cache = use_cache
         self.timeout = 30000
+        self.selector_timeout = 10000
+        self.metrics = None
+        self.started_at = None
 
     def checkStore(self):
         try:
@@ -25,10 +166,42 @@ class Scraper:
             if self.store not in method:
                 return {"error": "Store not found."}
 
-            return method[self.store]()
+            if not self.use_cache:
+                return method[self.store]()
+
+            cache = get_scrape_cache()
+            cached = cache.get(self.store, self.item)
+            if cached is not None:
+                return cached
+
+            # Identical searches already running in this process share one scrape
+            key = cache_key(self.store, self.item)
+            timeout = settings.SCRAPER_COALESCE_TIMEOUT
+            result = get_single_flight().do(key, lambda: self._scrape_once(key, method[self.store]), timeout=timeout)
+            return list(result) if isinstance(result, list) else result
+        except TimeoutError:
+            return {"error": f"Timed out waiting for another {STORES[self.store]['label']} search."}
         except Exception as e:
             return {"error": str(e)}
-        
+
+    def _scrape_once(self, key, scrape):
+        cache = get_scrape_cache()
+
+        def scrape_and_cache():
+            result = scrape()
+            if isinstance(result, list):
+                cache.set(self.store, self.item, result)
+            return result
+
+        # Other workers can only see this scrape's result through a shared cache backend
+        if cache.backend is None:
+            return scrape_and_cache()
+        return run_exclusive(
+            key, scrape_and_cache,
+            poll_result=lambda: cache.get_shared(self.store, self.item),
+            timeout=settings.SCRAPER_COALESCE_TIMEOUT,
+        )
+
     def extract_price(self, price_text):
         """Extract numeric price from text"""
         if not price_text:
@@ -37,318 +210,344 @@ class Scraper:
         if price_match:
             return Decimal(price_match.group())
         return None
-        
-    def scrape_target(self):
-        products = []
-        search_url = f"https://www.target.com/s?searchTerm={self.item.replace(' ', '+')}"
-        
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            try:
-                page.goto(search_url, wait_until='networkidle', timeout=self.timeout)
-                page.wait_for_selector('[data-test="product-grid"]', timeout=10000)
-                
-                items = page.query_selector_all('[data-test="@web/site-top-of-funnel/ProductCardWrapper"]')[:10]
-                
-                for item in items:
-                    try:
-                        name_el = item.query_selector('[data-test="product-title"]')
-                        price_el = item.query_selector('[data-test="current-price"]')
-                        link_el = item.query_selector('a')
-                        image_el = item.query_selector('img')
-                        
-                        if name_el and price_el:
-                            name = name_el.inner_text().strip()
-                            price = self.extract_price(price_el.inner_text())
-                            url = f"https://www.target.com{link_el.get_attribute('href')}" if link_el else search_url
-                            image_url = image_el.get_attribute('src') if image_el else None
-                            
-                            products.append({
-                                'name': name,
-                                'price': price,
-                                'url': url,
-                                'image_url': image_url,
-                                'in_stock': True
-                            })
-                    except Exception as e:
-                        print(f"Error parsing Target item: {e}")
-                        continue
-                        
-            except PlaywrightTimeout:
-                return {"error": "Scraping Target timeout exceeded."}
-            finally:
-                browser.close()
-        
+
+    def base_url(self, store):
+        # SCRAPER_BASE_URL_OVERRIDE points every store at a stand-in, e.g. "http://127.0.0.1:8765/{store}"
+        override = settings.SCRAPER_BASE_URL_OVERRIDE
+        return override.format(store=store) if override else STORES[store]["base_url"]
+
+    def search_url(self, store):
+        config = STORES[store]
+        query = self.item.replace(' ', config["space"])
+        return self.base_url(store) + config["search_path"].format(query=query)
+
+    def engine(self, store):
+        if store in settings.SCRAPER_HTTP_STORES:
+            return "http"
+        return STORES[store].get("engine", "browser")
+
+    def scrape_store(self, store):
+        """Run one store search unless the store's circuit is open, recording how it went"""
+        health = get_store_health(store)
+        if not health.allow():
+            return {"error": f"{STORES[store]['label']} is temporarily unavailable, please try again later."}
+
+        self.apply_timeouts(store)
+        self.started_at = None
+        result = None
+        try:
+            result = self._scrape_store(store)
+        finally:
+            if self.started_at is None:
+                # Never left the browser pool's queue, which says nothing about the store itself
+                health.release()
+            else:
+                health.record(isinstance(result, list), (time.perf_counter() - self.started_at) * 1000)
+
+        if isinstance(result, list):
+            record_prices(store, self.item, result)
+        return result
+
+    def apply_timeouts(self, store):
+        # Size timeouts from how fast the store has actually been answering
+        self.timeout = get_store_health(store).timeout_ms()
+        self.selector_timeout = min(self.selector_timeout, self.timeout)
+
+    def _scrape_store(self, store):
+        """Run one store search, over plain HTTP when the store allows it, else on a pooled browser"""
+        config = STORES[store]
+
+        if self.engine(store) == "http":
+            products = self._scrape_http(store)
+            if products:
+                return products
+            # Health then follows the browser search, timed from when it gets a browser
+            self.started_at = None
+
+        # Leave headroom past the page timeouts so a stuck job can't hold the request forever
+        job_timeout = (self.timeout + self.selector_timeout) / 1000 + 5
+        try:
+            return get_browser_pool().run(lambda context: self._search(context, store), timeout=job_timeout)
+        except (PlaywrightTimeout, FutureTimeout):
+            return {"error": f"Scraping {config['label']} timeout exceeded."}
+
+    def _scrape_http(self, store):
+        search_url = self.search_url(store)
+        metrics = {"http_fetches": 1}
+        self.metrics = metrics
+
+        start = self.started_at = time.perf_counter()
+        try:
+            content = fetch(search_url, timeout=(5, self.timeout / 1000))
+        except requests.exceptions.RequestException as e:
+            print(f"HTTP fetch failed for {STORES[store]['label']}, falling back to browser: {e}")
+            return []
+        metrics["navigation_ms"] = (time.perf_counter() - start) * 1000
+        metrics["bytes"] = len(content)
+
+        extract_start = time.perf_counter()
+        try:
+            products = self._build_products(store, parse_cards(content, STORES[store]), search_url)
+        except Exception as e:
+            # An unexpected page shape shouldn't fail the search while the browser can still try
+            print(f"HTTP parse failed for {STORES[store]['label']}, falling back to browser: {e}")
+            return []
+        metrics["extraction_ms"] = (time.perf_counter() - extract_start) * 1000
+        metrics["first_product_ms"] = (time.perf_counter() - start) * 1000
+
+        record_metrics(store, metrics)
         return products
-    
-    def scrape_walmart(self):
-        products = []
-        search_url = f"https://www.walmart.com/search?q={self.item.replace(' ', '+')}"
-        
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            try:
-                page.goto(search_url, wait_until='networkidle', timeout=self.timeout)
-                page.wait_for_selector('[data-testid="list-view"]', timeout=10000)
-                
-                items = page.query_selector_all('[data-item-id]')[:10]
-                
-                for item in items:
-                    try:
-                        name_el = item.query_selector('[data-automation-id="product-title"]')
-                        price_el = item.query_selector('[data-automation-id="product-price"] span')
-                        link_el = item.query_selector('a[link-identifier]')
-                        image_el = item.query_selector('img')
-                        
-                        if name_el and price_el:
-                            name = name_el.inner_text().strip()
-                            price = self.extract_price(price_el.inner_text())
-                            url = f"https://www.walmart.com{link_el.get_attribute('href')}" if link_el else search_url
-                            image_url = image_el.get_attribute('src') if image_el else None
-                            
-                            products.append({
-                                'name': name,
-                                'price': price,
-                                'url': url,
-                                'image_url': image_url,
-                                'in_stock': True
-                            })
-                    except Exception as e:
-                        print(f"Error parsing Walmart item: {e}")
-                        continue
-                        
-            except PlaywrightTimeout:
-                return {"error": "Scraping Walmart timeout exceeded."}
-            finally:
-                browser.close()
-        
+
+    def _search(self, context, store):
+        # Timed from here, on the browser thread, so waiting for a free browser isn't held against the store
+        self.started_at = time.perf_counter()
+        page, counters = self._open_page(context, store)
+        return self._search_page(page, counters, store)
+
+    def _open_page(self, context, store):
+        """Open a page with the store's blocking policy; counters track its traffic across searches"""
+        counters = {"requests": 0, "blocked": 0, "bytes": 0}
+
+        if settings.SCRAPER_BLOCK_REQUESTS:
+            policy = STORES[store].get("block", DEFAULT_BLOCKING)
+            context.route("**/*", lambda route: self._filter_request(route, policy, counters))
+
+        page = context.new_page()
+        page.on("response", lambda response: self._count_response(response, counters))
+        return page, counters
+
+    def _search_page(self, page, counters, store):
+        config = STORES[store]
+        search_url = self.search_url(store)
+        before = dict(counters)
+        metrics = {"browser_loads": 1}
+        self.metrics = metrics
+
+        start = time.perf_counter()
+        page.goto(search_url, wait_until='domcontentloaded', timeout=self.timeout)
+        metrics["navigation_ms"] = (time.perf_counter() - start) * 1000
+
+        page.wait_for_selector(config["ready"], timeout=self.selector_timeout)
+        page.wait_for_selector(config["card"], timeout=self.selector_timeout)
+        metrics["first_product_ms"] = (time.perf_counter() - start) * 1000
+
+        extract_start = time.perf_counter()
+        products = self._extract_products(page, store, search_url)
+        metrics["extraction_ms"] = (time.perf_counter() - extract_start) * 1000
+
+        for name, value in counters.items():
+            metrics[name] = value - before[name]
+        record_metrics(store, metrics)
         return products
-    
-    def scrape_aldi(self):
+
+    def _filter_request(self, route, policy, metrics):
+        request = route.request
+        host = urlparse(request.url).hostname or ""
+        blocked_host = any(host == blocked or host.endswith("." + blocked) for blocked in policy["hosts"])
+
+        if request.resource_type in policy["resource_types"] or blocked_host:
+            metrics["blocked"] += 1
+            route.abort()
+        else:
+            route.continue_()
+
+    def _count_response(self, response, metrics):
+        # Content-Length is already on the response, so this costs no extra round trip.
+        # Chunked responses don't send it and are left out of the byte count.
+        metrics["requests"] += 1
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            metrics["bytes"] += int(length)
+
+    def _extract_products(self, page, store, search_url):
+        config = STORES[store]
+
+        # One round trip pulls every card's fields instead of several calls per card
+        cards = page.eval_on_selector_all(config["card"], EXTRACT_PRODUCTS_JS, {
+            "limit": 10,
+            "name": config["name"],
+            "price": config["price"],
+            "link": config["link"],
+        })
+        return self._build_products(store, cards, search_url)
+
+    def _build_products(self, store, cards, search_url):
+        """Turn raw {name, price, href, image} cards from either engine into product results"""
+        config = STORES[store]
         products = []
-        search_url = f"https://www.aldi.us/en/products/search/?q={self.item.replace(' ', '+')}"
-        
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            try:
-                page.goto(search_url, wait_until='networkidle', timeout=self.timeout)
-                page.wait_for_selector('.product-tile', timeout=10000)
-                
-                items = page.query_selector_all('.product-tile')[:10]
-                
-                for item in items:
-                    try:
-                        name_el = item.query_selector('.product-tile__name')
-                        price_el = item.query_selector('.product-tile__price')
-                        link_el = item.query_selector('a')
-                        image_el = item.query_selector('img')
-                        
-                        if name_el:
-                            name = name_el.inner_text().strip()
-                            price = self.extract_price(price_el.inner_text()) if price_el else None
-                            url = link_el.get_attribute('href') if link_el else search_url
-                            image_url = image_el.get_attribute('src') if image_el else None
-                            
-                            products.append({
-                                'name': name,
-                                'price': price,
-                                'url': url if url.startswith('http') else f"https://www.aldi.us{url}",
-                                'image_url': image_url,
-                                'in_stock': True
-                            })
-                    except Exception as e:
-                        print(f"Error parsing Aldi item: {e}")
-                        continue
-                        
-            except PlaywrightTimeout:
-                return {"error": "Scraping Aldi timeout exceeded."}
-            finally:
-                browser.close()
-        
+
+        for card in cards:
+            if card["name"] is None or (config["require_price"] and card["price"] is None):
+                continue
+
+            products.append({
+                'name': card["name"],
+                'price': self.extract_price(card["price"]),
+                'url': self._absolute_url(store, card["href"]) if card["href"] else search_url,
+                'image_url': card["image"],
+                'in_stock': True
+            })
+
         return products
-    
+
+    def _absolute_url(self, store, url):
+        return url if url.startswith('http') else f"{self.base_url(store)}{url}"
+
+    def scrape_target(self):
+        return self.scrape_store("target")
+
+    def scrape_walmart(self):
+        return self.scrape_store("walmart")
+
+    def scrape_aldi(self):
+        return self.scrape_store("aldi")
+
     def scrape_albertsons(self):
-        products = []
-        search_url = f"https://www.albertsons.com/shop/search-results.html?q={self.item.replace(' ', '%20')}"
-        
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            try:
-                page.goto(search_url, wait_until='networkidle', timeout=self.timeout)
-                page.wait_for_selector('.product-item', timeout=10000)
-                
-                items = page.query_selector_all('.product-item')[:10]
-                
-                for item in items:
-                    try:
-                        name_el = item.query_selector('.product-title')
-                        price_el = item.query_selector('.product-price')
-                        link_el = item.query_selector('a.product-link')
-                        image_el = item.query_selector('img')
-                        
-                        if name_el:
-                            name = name_el.inner_text().strip()
-                            price = self.extract_price(price_el.inner_text()) if price_el else None
-                            url = link_el.get_attribute('href') if link_el else search_url
-                            image_url = image_el.get_attribute('src') if image_el else None
-                            
-                            products.append({
-                                'name': name,
-                                'price': price,
-                                'url': url if url.startswith('http') else f"https://www.albertsons.com{url}",
-                                'image_url': image_url,
-                                'in_stock': True
-                            })
-                    except Exception as e:
-                        print(f"Error parsing Albertsons item: {e}")
-                        continue
-                        
-            except PlaywrightTimeout:
-                return {"error": "Scraping Albertsons timeout exceeded."}
-            finally:
-                browser.close()
-        
-        return products
-    
+        return self.scrape_store("albertsons")
+
     def scrape_staterbros(self):
-        products = []
-        search_url = f"https://www.staterbros.com/search?searchTerm={self.item.replace(' ', '+')}"
-        
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            try:
-                page.goto(search_url, wait_until='networkidle', timeout=self.timeout)
-                page.wait_for_selector('.product-card', timeout=10000)
-                
-                items = page.query_selector_all('.product-card')[:10]
-                
-                for item in items:
-                    try:
-                        name_el = item.query_selector('.product-name')
-                        price_el = item.query_selector('.product-price')
-                        link_el = item.query_selector('a')
-                        image_el = item.query_selector('img')
-                        
-                        if name_el:
-                            name = name_el.inner_text().strip()
-                            price = self.extract_price(price_el.inner_text()) if price_el else None
-                            url = link_el.get_attribute('href') if link_el else search_url
-                            image_url = image_el.get_attribute('src') if image_el else None
-                            
-                            products.append({
-                                'name': name,
-                                'price': price,
-                                'url': url if url.startswith('http') else f"https://www.staterbros.com{url}",
-                                'image_url': image_url,
-                                'in_stock': True
-                            })
-                    except Exception as e:
-                        print(f"Error parsing Stater Bros item: {e}")
-                        continue
-                        
-            except PlaywrightTimeout:
-                return {"error": "Scraping Stater Bros timeout exceeded."}
-            finally:
-                browser.close()
-        
-        return products
-    
+        return self.scrape_store("staterbros")
+
     def scrape_sprouts(self):
-        products = []
-        search_url = f"https://shop.sprouts.com/search?search_term={self.item.replace(' ', '%20')}"
-        
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            try:
-                page.goto(search_url, wait_until='networkidle', timeout=self.timeout)
-                page.wait_for_selector('[data-testid="product-tile"]', timeout=10000)
-                
-                items = page.query_selector_all('[data-testid="product-tile"]')[:10]
-                
-                for item in items:
-                    try:
-                        name_el = item.query_selector('[data-testid="product-name"]')
-                        price_el = item.query_selector('[data-testid="product-price"]')
-                        link_el = item.query_selector('a')
-                        image_el = item.query_selector('img')
-                        
-                        if name_el:
-                            name = name_el.inner_text().strip()
-                            price = self.extract_price(price_el.inner_text()) if price_el else None
-                            url = link_el.get_attribute('href') if link_el else search_url
-                            image_url = image_el.get_attribute('src') if image_el else None
-                            
-                            products.append({
-                                'name': name,
-                                'price': price,
-                                'url': url if url.startswith('http') else f"https://shop.sprouts.com{url}",
-                                'image_url': image_url,
-                                'in_stock': True
-                            })
-                    except Exception as e:
-                        print(f"Error parsing Sprouts item: {e}")
-                        continue
-                        
-            except PlaywrightTimeout:
-                return {"error": "Scraping Sprouts timeout exceeded."}
-            finally:
-                browser.close()
-        
-        return products
-    
+        return self.scrape_store("sprouts")
+
     def scrape_costco(self):
-        products = []
-        search_url = f"https://www.costco.com/CatalogSearch?keyword={self.item.replace(' ', '+')}"
-        
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            try:
-                page.goto(search_url, wait_until='networkidle', timeout=self.timeout)
-                page.wait_for_selector('.product', timeout=10000)
-                
-                items = page.query_selector_all('.product')[:10]
-                
-                for item in items:
-                    try:
-                        name_el = item.query_selector('.description')
-                        price_el = item.query_selector('.price')
-                        link_el = item.query_selector('a')
-                        image_el = item.query_selector('img')
-                        
-                        if name_el:
-                            name = name_el.inner_text().strip()
-                            price = self.extract_price(price_el.inner_text()) if price_el else None
-                            url = link_el.get_attribute('href') if link_el else search_url
-                            image_url = image_el.get_attribute('src') if image_el else None
-                            
-                            products.append({
-                                'name': name,
-                                'price': price,
-                                'url': url if url.startswith('http') else f"https://www.costco.com{url}",
-                                'image_url': image_url,
-                                'in_stock': True
-                            })
-                    except Exception as e:
-                        print(f"Error parsing Costco item: {e}")
-                        continue
-                        
-            except PlaywrightTimeout:
-                return {"error": "Scraping Costco timeout exceeded."}
-            finally:
-                browser.close()
-        
-        return products
+        return self.scrape_store("costco")
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+def record_metrics(store, metrics):
+    with _metrics_lock:
+        totals = _metrics.setdefault(store, {"scrapes": 0})
+        totals["scrapes"] += 1
+        for name, value in metrics.items():
+            totals[name] = totals.get(name, 0) + value
+
+def metrics_summary():
+    """Average bytes, request counts and timings per store for scrapes run by this process"""
+    summary = {}
+    with _metrics_lock:
+        for store, totals in _metrics.items():
+            count = totals["scrapes"]
+            summary[store] = {name: value if name == "scrapes" else value / count for name, value in totals.items()}
+    return summary
+
+# Threads only wait on the browser pool, so this can be wider than the pool itself
+_compare_executor = ThreadPoolExecutor(max_workers=2 * len(STORES), thread_name_prefix="compare")
+
+def _check_store(store, item_name):
+    """checkStore on a _compare_executor thread"""
+    try:
+        return Scraper(store, item_name).checkStore()
+    finally:
+        # Price history, scrape locks and a database cache all use the ORM here, and these
+        # long-lived threads would otherwise each keep a database connection open
+        connection.close()
+
+def iter_compare_stores(item_name, stores=None, deadline=None):
+    """Scrape one item at several stores concurrently, yielding (store, result) as each one finishes"""
+    stores = stores or list(STORES)
+    deadline = deadline if deadline is not None else settings.SCRAPER_COMPARE_DEADLINE
+
+    futures = {_compare_executor.submit(_check_store, store, item_name): store for store in stores}
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            yield futures[future], future.result()
+    except FutureTimeout:
+        # Give up on stragglers at the deadline
+        for future, store in futures.items():
+            if not future.done():
+                future.cancel()
+                yield store, {"error": "Store comparison deadline exceeded."}
+
+def compare_stores(item_name, stores=None, deadline=None):
+    results = {}
+    errors = {}
+    for store, result in iter_compare_stores(item_name, stores, deadline):
+        if isinstance(result, dict) and "error" in result:
+            errors[store] = result["error"]
+        else:
+            results[store] = result
+
+    return {"item": item_name, "results": results, "errors": errors}
+
+def _search_batch(context, store, item_names):
+    """Search several items in turn on one reused page; runs on a browser pool thread"""
+    page, counters = Scraper(store, None)._open_page(context, store)
+    health = get_store_health(store)
+    results = {}
+    for name in item_names:
+        if not health.allow():
+            results[name] = {"error": f"{STORES[store]['label']} is temporarily unavailable, please try again later."}
+            continue
+
+        scraper = Scraper(store, name)
+        scraper.apply_timeouts(store)
+        start = time.perf_counter()
+        try:
+            results[name] = scraper._search_page(page, counters, store)
+        except PlaywrightTimeout:
+            results[name] = {"error": f"Scraping {STORES[store]['label']} timeout exceeded."}
+        except Exception as e:
+            results[name] = {"error": str(e)}
+        health.record(isinstance(results[name], list), (time.perf_counter() - start) * 1000)
+    return results
+
+def scrape_batch(item_names, stores=None, deadline=None):
+    """
+    Search many items at several stores. Browser stores get SCRAPER_BATCH_CONCURRENCY
+    contexts each, and every context works through its share of the items on one page.
+    Returns {store: {item name: products or {"error": ...}}}.
+    """
+    stores = stores or list(STORES)
+    deadline = deadline if deadline is not None else settings.SCRAPER_BATCH_DEADLINE
+    concurrency = max(1, settings.SCRAPER_BATCH_CONCURRENCY)
+    cache = get_scrape_cache()
+    item_names = list(dict.fromkeys(item_names))
+
+    results = {store: {} for store in stores}
+    futures = {}
+    for store in stores:
+        if Scraper(store, None).engine(store) == "http":
+            # checkStore already handles the cache, the HTTP attempt and the browser fallback
+            for name in item_names:
+                future = _compare_executor.submit(lambda store=store, name=name: {name: _check_store(store, name)})
+                futures[future] = (store, [name], False)
+            continue
+
+        pending = []
+        for name in item_names:
+            cached = cache.get(store, name)
+            if cached is not None:
+                results[store][name] = cached
+            else:
+                pending.append(name)
+
+        for chunk in (pending[i::concurrency] for i in range(concurrency)):
+            if chunk:
+                future = get_browser_pool().submit(lambda context, store=store, chunk=chunk: _search_batch(context, store, chunk))
+                futures[future] = (store, chunk, True)
+
+    _, unfinished = wait(futures, timeout=deadline)
+
+    for future, (store, chunk, needs_caching) in futures.items():
+        if future in unfinished:
+            future.cancel()
+            for name in chunk:
+                results[store][name] = {"error": "Batch scrape deadline exceeded."}
+            continue
+
+        try:
+            chunk_results = future.result()
+        except Exception as e:
+            chunk_results = {name: {"error": str(e)} for name in chunk}
+
+        for name, products in chunk_results.items():
+            results[store][name] = products
+            if needs_caching and isinstance(products, list):
+                cache.set(store, name, products)
+                record_prices(store, name, products)
+
+    return results
@@ -1,3 +1,642 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from unittest import mock
 
-# Create your tests here.
+import requests
+
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .benchmarks.standin import FIXTURES_DIR
+from .httpscrape import parse_cards
+from .ingest import claim_next_receipt, create_pending_receipt, process_receipt, save_parsed_receipts
+from .jobs import work
+from .management.commands.benchreceipts import load_corpus
+from .management.commands.benchscrapers import expected_products, mismatches
+from .models import CustomUser, Item, PriceObservation, Receipt, ReceiptUpload
+from .ocr import OcrSpaceBackend, get_ocr_backend, reset_ocr_backend
+from .prices import latest_prices, price_history, record_prices
+from .receiptparser import ParsedItem, ParsedReceipt, ReceiptParser
+from .scrapecache import ScrapeCache
+from .serializer import ReceiptSerializer
+from .singleflight import SingleFlight
+from .storehealth import StoreHealth
+from .storescrape import STORES, Scraper
+
+
+# What ReceiptParser currently reads from each recorded receipt, wrong fields included, so a
+# parser change that moves any of them shows up here; benchreceipts scores them against the truth
+PARSED_FIXTURES = {
+    "corner_deli": {
+        "store": "Sal's Corner Deli",
+        "address": "88 Elm Ave Hoboken, NJ 07030",
+        # No printed date, so the parser falls back to now
+        "date_purchased": None,
+        "subtotal": 19.0, "tax": 1.26, "total": 20.26,
+        "items": [("Turkey Club", 1, 1.5), ("Coffee Lg", 1, 2.75), ("Bagel w/ CC", 1, 3.25), ("Chips", 1, 1.5)],
+    },
+    "costco": {
+        "store": "Costco Wholesale",
+        "address": "1051 W Burbank Blvd Burbank, CA 91506",
+        "date_purchased": "2024-03-09T00:00:00",
+        "subtotal": 258.8, "tax": 3.9, "total": 0.0,
+        "items": [
+            ("Kirkland Signature Water 40pk", 1, 3.99), ("Rotisserie Chicken", 1, 4.99),
+            ("Organic Strawberries 2lb", 1, 6.99), ("Kirkland Paper Towels 12ct", 2, 1.99),
+            ("Avocados Bag of", 6, 5.99), ("Kirkland Olive Oil 2L", 1, 7.99),
+            ("Sweet Potatoes 5lb", 1, 4.49), ("Blueberries 18oz", 1, 5.49),
+            ("Kirkland Almonds 3lb", 1, 5.99), ("Croissants 12ct", 1, 6.99),
+            ("Ground Beef 88% 4lb", 2, 2.76), ("Atlantic Salmon Fillet", 2, 7.54),
+            ("Greek Yogurt 48oz", 1, 6.89), ("Baby Spinach 1lb", 1, 4.29),
+            ("Kirkland Coffee 3lb", 1, 8.99), ("Cage Free Eggs 24ct", 1, 7.49),
+            ("Sparkling Water 35pk", 1, 2.99), ("2 x Mixed Nuts", 1, 29.98),
+            ("Laundry Detergent 146 loads", 1, 9.99), ("Dish Soap 3pk", 1, 1.99),
+        ],
+    },
+    "cvs": {
+        "store": "CVS pharmacy",
+        "address": "120 Broadway New York, NY 10271",
+        "date_purchased": "2024-05-12T00:00:00",
+        "subtotal": 20.27, "tax": 8.87, "total": 22.07,
+        "items": [("CVS Ibuprofen 200mg 100ct", 1, 9.99), ("Kleenex", 3, 5.49)],
+    },
+    "faded_gas_station": {
+        "store": "SHELL",
+        "address": "Address not found",
+        "date_purchased": "06/30/24",
+        "subtotal": 47.18, "tax": 0.0, "total": 47.46,
+        "items": [("Snickers", 1, 1.89), ("Water 1L", 1, 2.29)],
+    },
+    "target": {
+        "store": "Target",
+        "address": "789 Market Street San Francisco, CA 94103",
+        "date_purchased": "2024-04-21T00:00:00",
+        "subtotal": 18.17, "tax": 8.62, "total": 19.16,
+        "items": [
+            ("Good & Gather Whole Milk", 1, 3.89), ("Good & Gather Bread", 1, 2.79),
+            ("Up&Up Tissues 3pk", 1, 5.49), ("Threshold Mug", 1, 6.0),
+        ],
+    },
+    "trader_joes": {
+        "store": "TRADER JOE'S",
+        "address": "2001 Point West Way Sacramento, CA 95815",
+        "date_purchased": "2024-01-14T00:00:00",
+        "subtotal": 31.43, "tax": 0.0, "total": 31.43,
+        "items": [
+            ("Organic Bananas", 1, 0.99), ("Mandarin Oranges", 1, 3.99), ("Greek Yogurt Plain", 1, 5.49),
+            ("Sourdough Bread", 1, 3.99), ("2 x Almond Butter", 1, 13.98), ("Frozen Mango Chunks", 1, 2.99),
+        ],
+    },
+    "walmart": {
+        "store": "Walmart",
+        "address": "4100 Main St Dallas, TX 75226",
+        "date_purchased": "2024-02-03T00:00:00",
+        "subtotal": 41.26, "tax": 8.25, "total": 43.45,
+        "items": [
+            ("Great Value Milk 1 Gal", 1, 3.48), ("Bounty Paper Towels", 1, 2.97), ("Tide Pods 42ct", 1, 3.47),
+            ("Bananas", 1, 1.24), ("Eggs Large 18ct", 1, 4.12), ("Cheerios Family Size", 1, 5.98),
+        ],
+    },
+    "whole_foods": {
+        "store": "WHOLE FOODS MARKET",
+        "address": "1765 California St San Francisco, CA 94109",
+        "date_purchased": "Jan",
+        "subtotal": 27.44, "tax": 0.0, "total": 27.44,
+        "items": [
+            ("365 Organic Milk", 1, 5.29), ("Sourdough Boule", 1, 4.99), ("Avocado Hass 3 @ 1.50", 1, 4.5),
+            ("Kombucha Ginger", 1, 3.99), ("Manchego Cheese", 1, 9.87),
+        ],
+    },
+}
+
+
+class ReceiptParserFixtureTests(SimpleTestCase):
+    def test_every_fixture_has_a_snapshot(self):
+        self.assertEqual(sorted(name for name, _, _, _ in load_corpus()), sorted(PARSED_FIXTURES))
+
+    def test_recorded_receipts_parse_as_before(self):
+        parser = ReceiptParser()
+        for name, _, lines, _ in load_corpus():
+            expected = PARSED_FIXTURES[name]
+            with self.subTest(receipt=name):
+                parsed = parser.parse(lines)
+                self.assertEqual(parsed.store, expected["store"])
+                self.assertEqual(parsed.address, expected["address"])
+                if expected["date_purchased"] is not None:
+                    self.assertEqual(parsed.date_purchased, expected["date_purchased"])
+                self.assertEqual([(item.name, item.quantity, item.price) for item in parsed.items], expected["items"])
+                for field in ("subtotal", "tax", "total"):
+                    self.assertAlmostEqual(getattr(parsed, field), expected[field], places=2, msg=field)
+
+
+def make_receipt(user, number, item_count):
+    receipt = Receipt.objects.create(
+        user=user, receipt_number=number, name=f"Receipt ({number})", store="Store", address="1 Main St",
+        subtotal=10.0, tax=1.0, total=11.0, taxpercent=10.0,
+    )
+    Item.objects.bulk_create([
+        Item(receipt=receipt, item_number=n, name=f"Item ({n})", quantity=1, price=1.0)
+        for n in range(1, item_count + 1)
+    ])
+    return receipt
+
+def parsed_receipt(item_count):
+    return ParsedReceipt(
+        store="Store", address="1 Main St", date_purchased="2024-01-14T00:00:00", subtotal=10.0, tax=1.0, total=11.0,
+        items=[ParsedItem(name=f"Item {n}", quantity=1, price=1.0) for n in range(item_count)],
+    )
+
+
+class ReceiptQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="queries", password="Queries-1")
+
+    def update(self, receipt, items, queries):
+        serializer = ReceiptSerializer(receipt, data={"subtotal": 20.0, "items": items}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.assertNumQueries(queries):
+            serializer.save()
+
+    def edit_items(self, item_count):
+        """Edits for every existing item, as many new items, and one item of another receipt"""
+        receipt = make_receipt(self.user, 1, item_count)
+        other = make_receipt(self.user, 2, 1)
+        items = [
+            {"id": item.id, "receipt": receipt.id, "name": f"{item.name} edited", "quantity": 2, "price": 2.0}
+            for item in receipt.items.all()
+        ]
+        items += [{"receipt": receipt.id, "name": f"New {n}", "quantity": 1, "price": 3.0} for n in range(item_count)]
+        items.append({"id": other.items.get().id, "receipt": receipt.id, "name": "Moved", "quantity": 1, "price": 4.0})
+        return receipt, other, items
+
+    def test_update_query_count_does_not_grow_with_items(self):
+        # savepoint, in_bulk, bulk_update, Max(item_number), bulk_create, receipt save, release
+        for item_count in (2, 25):
+            with self.subTest(items=item_count):
+                Receipt.objects.all().delete()
+                receipt, other, items = self.edit_items(item_count)
+                self.update(receipt, items, 7)
+
+                self.assertEqual(receipt.items.filter(name__endswith="edited", quantity=2).count(), item_count)
+                self.assertEqual(receipt.items.count(), 2 * item_count + 1)
+                # An id from another receipt makes a new item here and leaves the other receipt alone
+                self.assertEqual(other.items.get().name, "Item (1)")
+                self.assertEqual(receipt.items.get(name__startswith="Moved").item_number, 2 * item_count + 1)
+                receipt.refresh_from_db()
+                self.assertAlmostEqual(receipt.tax, 2.0)
+                self.assertAlmostEqual(receipt.total, 22.0)
+
+    def test_update_with_only_existing_or_only_new_items(self):
+        receipt = make_receipt(self.user, 1, 3)
+        # savepoint, in_bulk, bulk_update, receipt save, release
+        self.update(receipt, [{"id": item.id, "receipt": receipt.id, "price": 5.0} for item in receipt.items.all()], 5)
+        self.assertEqual(list(receipt.items.values_list("price", flat=True)), [5.0] * 3)
+        # savepoint, Max(item_number), bulk_create, receipt save, release
+        self.update(receipt, [{"receipt": receipt.id, "name": "New", "quantity": 1, "price": 1.0}] * 3, 5)
+        self.assertEqual(sorted(receipt.items.values_list("item_number", flat=True)), [1, 2, 3, 4, 5, 6])
+
+    def test_create_numbers_after_the_latest_receipt(self):
+        latest = make_receipt(self.user, 3, 0)
+        # ItemSerializer requires a receipt on every item; create ignores it
+        serializer = ReceiptSerializer(data={
+            "name": "Groceries", "store": "Store", "address": "1 Main St", "subtotal": 2.0, "tax": 0.0,
+            "total": 2.0, "taxpercent": 0.0,
+            "items": [
+                {"receipt": latest.id, "name": "Milk", "quantity": 1, "price": 1.0},
+                {"receipt": latest.id, "name": "Eggs", "quantity": 1, "price": 1.0},
+            ],
+        }, context={"request": mock.Mock(user=self.user)})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        # savepoint, user lock, last number, receipt, items, release
+        with self.assertNumQueries(6):
+            receipt = serializer.save()
+
+        self.assertEqual((receipt.receipt_number, receipt.name), (4, "Groceries (4)"))
+        self.assertEqual(list(receipt.items.order_by("item_number").values_list("name", flat=True)), ["Milk (1)", "Eggs (2)"])
+
+    def test_save_parsed_receipts_query_count_does_not_grow_with_receipts(self):
+        # savepoint, user lock, last number, receipts, items, count, num_receipts, release; kept under
+        # the 999 parameters SQLite takes per INSERT, past which bulk_create splits the items itself
+        for receipt_count, item_count in ((1, 1), (20, 5)):
+            with self.subTest(receipts=receipt_count, items=item_count):
+                Receipt.objects.all().delete()
+                with self.assertNumQueries(8):
+                    receipts = save_parsed_receipts(self.user, [parsed_receipt(item_count) for _ in range(receipt_count)])
+
+                self.assertEqual([receipt.receipt_number for receipt in receipts], list(range(1, receipt_count + 1)))
+                self.assertEqual(Item.objects.filter(receipt__user=self.user).count(), receipt_count * item_count)
+                self.user.refresh_from_db()
+                self.assertEqual(self.user.num_receipts, receipt_count)
+
+    def test_save_parsed_receipts_adds_two_inserts_per_batch(self):
+        make_receipt(self.user, 4, 0)
+        # Two batches of two and one of one, each inserting receipts then items
+        with self.assertNumQueries(6 + 3 * 2):
+            receipts = save_parsed_receipts(self.user, [parsed_receipt(2) for _ in range(5)], batch_size=2)
+        self.assertEqual([receipt.receipt_number for receipt in receipts], [5, 6, 7, 8, 9])
+
+
+class ProcessReceiptTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="worker", password="Worker-1")
+        create_pending_receipt(self.user, SimpleUploadedFile("receipt.png", b"image"))
+        self.receipt = claim_next_receipt()
+
+    def process(self, read_result):
+        def read_receipt(upload):
+            self.assertEqual(upload.read(), b"image")
+            if callable(read_result):
+                return read_result()
+            return read_result
+
+        with mock.patch("receipts.ingest.read_receipt", side_effect=read_receipt):
+            process_receipt(self.receipt)
+
+    def test_parsed_receipt_is_saved(self):
+        self.process({"success": True, "data": ["TRADER JOE'S", "BANANAS 0.99", "TOTAL 0.99"]})
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.processing_state, Receipt.DONE)
+        self.assertEqual(self.receipt.store, "TRADER JOE'S")
+        self.assertEqual(self.receipt.items.count(), 1)
+        self.assertFalse(ReceiptUpload.objects.exists())
+
+    def test_ocr_failure_message_is_kept(self):
+        self.process({"success": False, "message": "Receipts can have at most 10 pages."})
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.processing_state, Receipt.FAILED)
+        self.assertEqual(self.receipt.processing_error, "Receipts can have at most 10 pages.")
+        self.assertFalse(ReceiptUpload.objects.exists())
+
+    def test_receipt_deleted_during_ocr_stays_deleted(self):
+        def delete_then_read():
+            Receipt.objects.filter(pk=self.receipt.pk).delete()
+            return {"success": True, "data": ["TRADER JOE'S", "BANANAS 0.99", "TOTAL 0.99"]}
+
+        self.process(delete_then_read)
+        self.assertFalse(Receipt.objects.filter(pk=self.receipt.pk).exists())
+        self.assertFalse(Item.objects.exists())
+
+    def test_receipt_deleted_before_ocr_fails_is_left_alone(self):
+        def delete_then_fail():
+            Receipt.objects.filter(pk=self.receipt.pk).delete()
+            return {"success": False, "message": "Lines do not exist in image."}
+
+        self.process(delete_then_fail)
+        self.assertFalse(Receipt.objects.filter(pk=self.receipt.pk).exists())
+
+    def test_receipt_without_an_upload_fails(self):
+        ReceiptUpload.objects.all().delete()
+        process_receipt(self.receipt)
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.processing_state, Receipt.FAILED)
+
+    def test_unexpected_error_fails_the_receipt(self):
+        def broken():
+            raise ValueError("boom")
+
+        self.process(broken)
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.processing_state, Receipt.FAILED)
+        self.assertEqual(self.receipt.processing_error, "Error while reading receipt.")
+
+
+class WorkLoopTests(SimpleTestCase):
+    def test_errors_do_not_stop_the_loop(self):
+        stop = threading.Event()
+        calls = []
+
+        def claim():
+            calls.append(1)
+            if len(calls) == 1:
+                raise DatabaseError("connection lost")
+            stop.set()
+            return None
+
+        with mock.patch("receipts.jobs.fail_stale_jobs"), mock.patch("receipts.jobs.fail_stale_receipts"), \
+                mock.patch("receipts.jobs.claim_next_receipt", side_effect=claim), \
+                mock.patch("receipts.jobs.claim_next_job", return_value=None), \
+                mock.patch("receipts.jobs.close_old_connections") as close_old_connections:
+            work(poll_interval=0, stop=stop)
+
+        self.assertEqual(len(calls), 2)
+        # Before each iteration, plus once after the failure
+        self.assertEqual(close_old_connections.call_count, 3)
+
+
+class QueuedBrowserPool:
+    """Stands in for the browser pool: waits in the queue, then runs the job or times out unstarted"""
+
+    def __init__(self, queue_wait, start=True):
+        self.queue_wait = queue_wait
+        self.start = start
+
+    def run(self, fn, timeout=None):
+        time.sleep(self.queue_wait)
+        if not self.start:
+            raise FutureTimeout()
+        return fn(None)
+
+
+class ScrapeStoreHealthTests(SimpleTestCase):
+    def scrape(self, health, pool):
+        scraper = Scraper("walmart", "milk")
+        with mock.patch("receipts.storescrape.get_store_health", return_value=health), \
+                mock.patch("receipts.storescrape.get_browser_pool", return_value=pool), \
+                mock.patch("receipts.storescrape.record_prices"), \
+                mock.patch.object(Scraper, "_open_page", return_value=(None, {})), \
+                mock.patch.object(Scraper, "_search_page", return_value=[{"name": "Milk"}]):
+            return scraper.scrape_store("walmart")
+
+    def test_time_queued_for_a_browser_is_not_counted(self):
+        health = StoreHealth(min_calls=1)
+        self.assertEqual(self.scrape(health, QueuedBrowserPool(0.2)), [{"name": "Milk"}])
+        self.assertEqual(health.stats()["calls"], 1)
+        self.assertLess(health.stats()["p95_ms"], 100)
+
+    def test_job_that_never_started_is_not_a_store_failure(self):
+        health = StoreHealth(min_calls=1, cooldown=0)
+        health.record(False, 0)
+        self.assertEqual(health.state, StoreHealth.OPEN)
+
+        # The half-open probe times out in the queue, so the next search may probe instead
+        self.assertIn("error", self.scrape(health, QueuedBrowserPool(0, start=False)))
+        self.assertEqual(health.state, StoreHealth.HALF_OPEN)
+        self.assertEqual(health.stats()["calls"], 1)
+        self.assertTrue(health.allow())
+
+
+class PriceHistoryTests(TestCase):
+    def test_long_searches_fit_the_query_column(self):
+        item = "organic " * 30 + "milk"
+        record_prices("walmart", item, [{"name": "Milk", "price": "3.49", "url": "https://example.com/milk"}])
+
+        self.assertEqual(len(PriceObservation.objects.get().query), 100)
+        self.assertEqual([product["price"] for product in latest_prices("walmart", item)], [3.49])
+        self.assertEqual(len(price_history("walmart", item)), 1)
+
+
+class ScrapeCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+
+    def test_copies_from_the_shared_backend_keep_the_original_expiry(self):
+        clock = {"wall": 1000.0, "monotonic": 50.0}
+        fake_time = mock.Mock(time=lambda: clock["wall"], monotonic=lambda: clock["monotonic"])
+
+        with mock.patch("receipts.scrapecache.time", fake_time):
+            ScrapeCache(ttl=10, backend="default").set("walmart", "milk", [{"name": "Milk"}])
+            clock["wall"] += 8
+            clock["monotonic"] += 8
+
+            other_worker = ScrapeCache(ttl=10, backend="default")
+            self.assertEqual(other_worker.get("walmart", "milk"), [{"name": "Milk"}])
+            self.assertEqual(other_worker.stats()["shared_hits"], 1)
+
+            # Two seconds were left on the shared entry, so the local copy lapses with it
+            clock["wall"] += 3
+            clock["monotonic"] += 3
+            self.assertIsNone(other_worker.get("walmart", "milk"))
+
+
+class StoreHealthTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch("receipts.storehealth.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.health = StoreHealth(window=10, min_calls=4, failure_rate=0.5, cooldown=30, min_timeout=5000, max_timeout=30000)
+
+    def open_circuit(self):
+        for ok in (True, True, False, False):
+            self.assertTrue(self.health.allow())
+            self.health.record(ok, 100)
+        self.assertEqual(self.health.state, StoreHealth.OPEN)
+
+    def test_stays_closed_below_min_calls_or_failure_rate(self):
+        for _ in range(3):
+            self.health.record(False, 100)
+        self.assertEqual(self.health.state, StoreHealth.CLOSED)
+
+        self.health.results.clear()
+        for ok in (True, True, True, True, False, False, False):
+            self.health.record(ok, 100)
+        self.assertEqual(self.health.state, StoreHealth.CLOSED)
+
+    def test_open_circuit_rejects_until_the_cooldown(self):
+        self.open_circuit()
+        self.assertFalse(self.health.allow())
+        self.now += 29
+        self.assertFalse(self.health.allow())
+        self.assertEqual(self.health.stats()["rejected"], 2)
+
+    def test_half_open_lets_one_probe_through_and_closes_on_success(self):
+        self.open_circuit()
+        self.now += 30
+        self.assertTrue(self.health.allow())
+        self.assertEqual(self.health.state, StoreHealth.HALF_OPEN)
+        self.assertFalse(self.health.allow())
+
+        self.health.record(True, 100)
+        self.assertEqual(self.health.state, StoreHealth.CLOSED)
+        self.assertEqual(self.health.stats()["calls"], 0)
+        self.assertTrue(self.health.allow())
+
+    def test_failed_probe_opens_the_circuit_again(self):
+        self.open_circuit()
+        self.now += 30
+        self.assertTrue(self.health.allow())
+        self.health.record(False, 100)
+        self.assertEqual(self.health.state, StoreHealth.OPEN)
+
+        self.now += 29
+        self.assertFalse(self.health.allow())
+        self.now += 1
+        self.assertTrue(self.health.allow())
+
+    def test_timeout_follows_p95_within_bounds(self):
+        # The maximum until there are min_calls successful latencies
+        for _ in range(3):
+            self.health.record(True, 100)
+        self.assertEqual(self.health.timeout_ms(), 30000)
+
+        self.health.record(True, 4000)
+        self.assertEqual(self.health.timeout_ms(), 8000)
+
+        for _ in range(10):
+            self.health.record(True, 100)
+        self.assertEqual(self.health.timeout_ms(), 5000)
+
+        for _ in range(10):
+            self.health.record(True, 20000)
+        self.assertEqual(self.health.timeout_ms(), 30000)
+
+    def test_failures_do_not_shorten_the_timeout(self):
+        for _ in range(4):
+            self.health.record(True, 4000)
+        self.health.record(False, 1)
+        self.assertEqual(self.health.timeout_ms(), 8000)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def start_leader(self, flight, fn):
+        """Run fn as the leader on another thread, returning once it is in flight"""
+        started = threading.Event()
+        outcome = {}
+
+        def run():
+            started.set()
+            return fn()
+
+        def lead():
+            try:
+                outcome["result"] = flight.do("key", run)
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=lead)
+        thread.start()
+        started.wait(5)
+        return thread, outcome
+
+    def test_followers_share_the_leaders_result(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        leader, outcome = self.start_leader(flight, lambda: release.wait(5) and ["result"])
+
+        follower_results = []
+        followers = [threading.Thread(target=lambda: follower_results.append(flight.do("key", lambda: ["own"], timeout=5))) for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        while flight.stats()["followed"] < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(outcome["result"], ["result"])
+        self.assertEqual(follower_results, [["result"]] * 3)
+        self.assertEqual(flight.stats(), {"in_flight": 0, "led": 1, "followed": 3})
+
+    def test_followers_get_the_leaders_exception(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise ValueError("store down")
+
+        leader, outcome = self.start_leader(flight, fail)
+        errors = []
+
+        def follow():
+            try:
+                flight.do("key", lambda: "own", timeout=5)
+            except ValueError as e:
+                errors.append(e)
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        while flight.stats()["followed"] < 1:
+            time.sleep(0.01)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual([str(e) for e in errors], ["store down"])
+        self.assertIs(errors[0], outcome["error"])
+
+    def test_follower_times_out_and_the_next_call_leads(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        leader, _ = self.start_leader(flight, lambda: release.wait(5))
+
+        with self.assertRaises(TimeoutError):
+            flight.do("key", lambda: "own", timeout=0.05)
+        release.set()
+        leader.join(5)
+
+        self.assertEqual(flight.do("key", lambda: "own"), "own")
+        self.assertEqual(flight.stats()["led"], 2)
+
+
+@override_settings(SCRAPER_BASE_URL_OVERRIDE="http://standin/{store}")
+class ParseCardsTests(SimpleTestCase):
+    def test_recorded_store_pages_parse_without_a_browser(self):
+        for store in STORES:
+            with self.subTest(store=store):
+                content = (FIXTURES_DIR / "stores" / f"{store}.html").read_bytes()
+                scraper = Scraper(store, "milk")
+                products = scraper._build_products(store, parse_cards(content, STORES[store]), scraper.search_url(store))
+                self.assertEqual(mismatches(products, expected_products(store, f"http://standin/{store}")), [])
+
+    def test_limit_caps_the_cards(self):
+        content = (FIXTURES_DIR / "stores" / "walmart.html").read_bytes()
+        self.assertEqual(len(parse_cards(content, STORES["walmart"], limit=2)), 2)
+
+    def test_malformed_offers_keep_the_product_without_a_price(self):
+        products = [
+            {"@type": "Product", "name": "Bare price", "offers": "3.49"},
+            {"@type": "Product", "name": "List of strings", "offers": ["3.49"]},
+            {"@type": "Product", "name": "Offer", "offers": [{"price": 2.99}]},
+        ]
+        content = f'<html><script type="application/ld+json">{json.dumps(products)}</script></html>'.encode()
+
+        cards = parse_cards(content, STORES["walmart"])
+        self.assertEqual([(card["name"], card["price"]) for card in cards], [("Bare price", None), ("List of strings", None), ("Offer", "2.99")])
+
+    def test_unparseable_page_has_no_cards(self):
+        self.assertEqual(parse_cards(b"", STORES["walmart"]), [])
+
+
+def ocr_response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b"{}"
+    return response
+
+
+class OcrSpaceRetryTests(SimpleTestCase):
+    def backend(self, *outcomes, retries=2):
+        backend = OcrSpaceBackend(retries=retries, backoff=0)
+        backend.session = mock.Mock()
+        backend.session.post.side_effect = outcomes
+        return backend
+
+    def test_server_errors_are_retried(self):
+        backend = self.backend(ocr_response(503), ocr_response(502), ocr_response(200))
+        self.assertEqual(backend._post(files={}, data={}).status_code, 200)
+        self.assertEqual(backend.session.post.call_count, 3)
+        self.assertEqual({key: backend.stats()[key] for key in ("calls", "retried", "failures")}, {"calls": 3, "retried": 2, "failures": 2})
+
+    def test_timeouts_and_connection_errors_are_retried(self):
+        backend = self.backend(requests.exceptions.Timeout(), requests.exceptions.ConnectionError(), ocr_response(200))
+        self.assertEqual(backend._post(files={}, data={}).status_code, 200)
+        self.assertEqual(backend.session.post.call_count, 3)
+
+    def test_gives_up_after_the_retries(self):
+        backend = self.backend(*[requests.exceptions.Timeout()] * 3)
+        with self.assertRaises(requests.exceptions.Timeout):
+            backend._post(files={}, data={})
+        self.assertEqual(backend.session.post.call_count, 3)
+
+        backend = self.backend(*[ocr_response(503)] * 2, retries=1)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            backend._post(files={}, data={})
+        self.assertEqual(backend.session.post.call_count, 2)
+
+    def test_client_errors_are_not_retried(self):
+        backend = self.backend(ocr_response(403), ocr_response(200))
+        with self.assertRaises(requests.exceptions.HTTPError):
+            backend._post(files={}, data={})
+        self.assertEqual(backend.session.post.call_count, 1)
+
+    @override_settings(OCR_BACKEND="ocrspace", OCR_RETRIES=0)
+    def test_retries_come_from_settings(self):
+        reset_ocr_backend()
+        self.addCleanup(reset_ocr_backend)
+        self.assertEqual(get_ocr_backend().retries, 0)
@@ -10,10 +10,21 @@ urlpatterns = [
     path("user/figures/", user_views.figures),
     path("logout/", user_views.logout_view),
     path("createreceipt/", receipt_views.create_receipt),
+    path("createreceipts/", receipt_views.bulk_create_receipts),
     path("getreceipts/", receipt_views.get_receipts),
+    path("ocrstats/", receipt_views.ocr_stats),
     path("receipt/<str:receipt_id>/", receipt_views.receipt_view),
+    path("receipt/<str:receipt_id>/status/", receipt_views.receipt_status),
     path("createitem/<str:receipt_id>/", item_views.create_item),
     path("getitems/<str:receipt_id>/", item_views.get_all_items),
     path("item/<str:item_id>/", item_views.item_view),
-    path("scrapestore", item_views.check_stores)
+    path("scrapestore", item_views.check_stores),
+    path("scrapestores", item_views.check_all_stores),
+    path("scrapestores/stream", item_views.stream_all_stores),
+    path("scrapebatch/", item_views.batch_check_stores),
+    path("scrapestats", item_views.scrape_stats),
+    path("prices/latest", item_views.latest_prices_view),
+    path("prices/history", item_views.price_history_view),
+    path("scrapejobs/", item_views.submit_scrape_job),
+    path("scrapejobs/<str:job_id>/", item_views.scrape_job_view),
 ]
@@ -1,3 +1,7 @@
+import json
+import re
+import time
+
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
@@ -6,10 +10,18 @@ from django_ratelimit.decorators import ratelimit
 from django_ratelimit.exceptions import Ratelimited
 
 from django.utils import timezone
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.views.decorators.http import require_GET
+from django.core.exceptions import ValidationError
 
-from ..models import CustomUser, Receipt, Item
+from ..models import CustomUser, Receipt, Item, ScrapeJob
 from ..serializer import ItemSerializer
-from ..storescrape import Scraper
+from ..storescrape import Scraper, STORES, compare_stores, iter_compare_stores, metrics_summary, scrape_batch
+from ..scrapecache import get_scrape_cache
+from ..singleflight import get_single_flight
+from ..storehealth import health_summary
+from ..prices import latest_prices, price_history
 
 @api_view(["POST"])
 @ratelimit(key="ip", rate="5/s", block=True)
@@ -170,3 +182,270 @@ def check_stores(request):
     except Exception as e:
         print(str(e))
         return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@ratelimit(key="ip", rate="1/s", block=True)
+def check_all_stores(request):
+    try:
+        item = request.query_params.get("item")
+        stores = request.query_params.get("stores")
+
+        if not item:
+            return Response({"error": "Missing item name to compare."}, status=status.HTTP_400_BAD_REQUEST)
+
+        store_list = [store.strip() for store in stores.split(",") if store.strip()] if stores else list(STORES)
+        unknown = [store for store in store_list if store not in STORES]
+        if unknown:
+            return Response({"error": f"Store not found: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = compare_stores(item, store_list)
+
+        return Response(result, status=status.HTTP_200_OK)
+
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+def stream_store_events(item, stores):
+    start = time.perf_counter()
+    succeeded = []
+    failed = []
+
+    for store, result in iter_compare_stores(item, stores):
+        if isinstance(result, dict) and "error" in result:
+            failed.append(store)
+            yield sse_event("store", {"store": store, "error": result["error"]})
+        else:
+            succeeded.append(store)
+            yield sse_event("store", {"store": store, "products": result})
+
+    yield sse_event("summary", {
+        "item": item,
+        "succeeded": succeeded,
+        "failed": failed,
+        "elapsed_ms": (time.perf_counter() - start) * 1000,
+    })
+
+@require_GET
+@ratelimit(key="ip", rate="1/s", block=True)
+def stream_all_stores(request):
+    """Server-Sent Events version of check_all_stores: one "store" event per store as it finishes, then a "summary" event"""
+    try:
+        item = request.GET.get("item")
+        stores = request.GET.get("stores")
+
+        if not item:
+            return JsonResponse({"error": "Missing item name to compare."}, status=status.HTTP_400_BAD_REQUEST)
+
+        store_list = [store.strip() for store in stores.split(",") if store.strip()] if stores else list(STORES)
+        unknown = [store for store in store_list if store not in STORES]
+        if unknown:
+            return JsonResponse({"error": f"Store not found: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(stream_store_events(item, store_list), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    except Ratelimited:
+        return JsonResponse({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except Exception as e:
+        print(str(e))
+        return JsonResponse({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(["GET"])
+@ratelimit(key="ip", rate="5/s", block=True)
+def scrape_stats(request):
+    try:
+        return Response({
+            "cache": get_scrape_cache().stats(),
+            "coalescing": get_single_flight().stats(),
+            "health": health_summary(),
+            "stores": metrics_summary(),
+        }, status=status.HTTP_200_OK)
+
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.job_uuid,
+        "store": job.store,
+        "item": job.item,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+@api_view(["POST"])
+@ratelimit(key="ip", rate="5/s", block=True)
+def submit_scrape_job(request):
+    try:
+        store = request.data.get("store")
+        item = request.data.get("item")
+
+        if not store or not item:
+            return Response({"error": "Missing store or item to scrape."}, status=status.HTTP_400_BAD_REQUEST)
+        if store not in STORES:
+            return Response({"error": "Store not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Answer straight away when the result is already cached
+        cached = get_scrape_cache().get(store, item)
+        if cached is not None:
+            job = ScrapeJob.objects.create(store=store, item=item, status=ScrapeJob.DONE, result=cached, finished_at=timezone.now())
+        else:
+            job = ScrapeJob.objects.create(store=store, item=item)
+
+        return Response(serialize_job(job), status=status.HTTP_202_ACCEPTED)
+
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(["GET"])
+@ratelimit(key="ip", rate="5/s", block=True)
+def scrape_job_view(request, job_id):
+    try:
+        job = ScrapeJob.objects.get(job_uuid=job_id)
+
+        return Response(serialize_job(job), status=status.HTTP_200_OK)
+
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except (ScrapeJob.DoesNotExist, ValidationError):
+        return Response({"error": "Scrape job not found."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+MAX_BATCH_ITEMS = 100
+
+def search_name(item_name):
+    # Items are saved as "Name (n)"; the suffix only hurts store searches
+    return re.sub(r"\s*\(\d+\)$", "", item_name).strip()
+
+def best_price(products):
+    if not isinstance(products, list):
+        return None
+    prices = [float(product["price"]) for product in products if product["price"] is not None]
+    return min(prices) if prices else None
+
+@api_view(["POST"])
+@ratelimit(key="ip", rate="1/s", block=True)
+def batch_check_stores(request):
+    try:
+        receipt_id = request.data.get("receipt")
+        names = request.data.get("items")
+        stores = request.data.get("stores") or list(STORES)
+
+        if not isinstance(stores, list) or any(store not in STORES for store in stores):
+            return Response({"error": "Invalid store list."}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = []
+        if receipt_id:
+            if not request.user.is_authenticated or not request.user:
+                return Response({"error": "Please log in."}, status=status.HTTP_401_UNAUTHORIZED)
+
+            receipt = Receipt.objects.get(receipt_uuid = receipt_id) # Throws DoesNotExist exception
+
+            if receipt.user != request.user:
+                return Response({"error": "Not authorized to access this receipt"}, status=status.HTTP_403_FORBIDDEN)
+
+            items = list(receipt.items.all())
+            names = [search_name(item.name) for item in items]
+        elif not isinstance(names, list) or not names or not all(isinstance(name, str) and name.strip() for name in names):
+            return Response({"error": "Missing receipt or item names to compare."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(names) > MAX_BATCH_ITEMS:
+            return Response({"error": f"Too many items, please compare at most {MAX_BATCH_ITEMS} at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = scrape_batch(names, stores)
+
+        # Record the best price found at each store on every receipt item in one query
+        if items:
+            now = timezone.now()
+            for item, name in zip(items, names):
+                stores_checked = dict(item.stores_checked or {})
+                for store in stores:
+                    price = best_price(results[store].get(name))
+                    if price is not None:
+                        stores_checked[store] = price
+                item.stores_checked = stores_checked
+                item.last_updated = now
+            Item.objects.bulk_update(items, ["stores_checked", "last_updated"])
+
+        return Response({"results": results, "updated": len(items)}, status=status.HTTP_200_OK)
+
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except (Receipt.DoesNotExist, ValidationError):
+        return Response({"error": "Receipt not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@ratelimit(key="ip", rate="5/s", block=True)
+def latest_prices_view(request):
+    try:
+        item = request.query_params.get("item")
+        stores = request.query_params.get("stores")
+
+        if not item:
+            return Response({"error": "Missing item name."}, status=status.HTTP_400_BAD_REQUEST)
+
+        store_list = [store.strip() for store in stores.split(",") if store.strip()] if stores else list(STORES)
+        results = {store: latest_prices(store, item) for store in store_list if store in STORES}
+        best = {}
+        for store, observations in results.items():
+            prices = [observation["price"] for observation in observations if observation["price"] is not None]
+            if prices:
+                best[store] = min(prices)
+
+        return Response({"item": item, "results": results, "best": best}, status=status.HTTP_200_OK)
+
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(["GET"])
+@ratelimit(key="ip", rate="5/s", block=True)
+def price_history_view(request):
+    try:
+        item = request.query_params.get("item")
+        store = request.query_params.get("store")
+        days = int(request.query_params.get("days") or 30)
+
+        if not item or not store:
+            return Response({"error": "Missing store or item name."}, status=status.HTTP_400_BAD_REQUEST)
+        if store not in STORES:
+            return Response({"error": "Store not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"store": store, "item": item, "history": price_history(store, item, days)}, status=status.HTTP_200_OK)
+
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except ValueError:
+        return Response({"error": "Days must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -6,10 +6,14 @@ from rest_framework import status
 from django_ratelimit.decorators import ratelimit
 from django_ratelimit.exceptions import Ratelimited
 
+from django.conf import settings
+
 from ..models import Receipt
 from ..serializer import ReceiptSerializer, FileSerializer
 
-from ..methods import read_receipt, ReceiptParser
+from ..ingest import create_pending_receipt, parse_uploads, save_parsed_receipts
+from ..ocr import get_ocr_backend
+from .. import ocrcache
 
 @api_view(["GET"])
 @ratelimit(key="ip", rate="5/s", block=True)
@@ -27,7 +31,7 @@ def get_receipts(request):
         if not dateordertype:
             dateordertype = "last_updated"
         
-        receipts = Receipt.objects.filter(user=request.user).order_by(f"-{dateordertype}").values("receipt_uuid","name","date_purchased","num_items","total")[0:limit] 
+        receipts = Receipt.objects.filter(user=request.user).order_by(f"-{dateordertype}").values("receipt_uuid","name","date_purchased","num_items","total","processing_state")[0:limit] 
 
         return Response(receipts, status=status.HTTP_200_OK)
     except Ratelimited:
@@ -36,6 +40,16 @@ def get_receipts(request):
         print(str(e))
         return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+UPLOAD_EXTENSIONS = ["jpg", "jpeg", "png", "pdf", "bmp", "tiff", "gif"]
+
+def upload_error(upload):
+    """(message, status) when an uploaded receipt file can't be accepted, otherwise None"""
+    if upload.name.split(".")[-1].lower() not in UPLOAD_EXTENSIONS:
+        return "Invalid file type, please input files in the form of jpg, jpeg, png, pdf, bmp, tiff, or gif.", status.HTTP_400_BAD_REQUEST
+    if upload.size > settings.RECEIPT_MAX_UPLOAD_BYTES:
+        return "File size is too large.", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    return None
+
 @api_view(["POST"])
 @parser_classes([MultiPartParser, FormParser])
 @ratelimit(key="ip", rate="1/s", block=True)
@@ -55,53 +69,67 @@ def create_receipt(request):
 
         valid_file = request.FILES["file"]
 
-        if valid_file.name.split(".")[-1].lower() not in ["jpg", "jpeg", "png", "pdf", "bmp", "tiff", "gif"]:
-            return Response({"error": "Invalid file type, please input files in the form of jpg, jpeg, png, pdf, bmp, tiff, or gif."}, status=status.HTTP_400_BAD_REQUEST)
-
-        if valid_file.size > 1024 * 1024:
-            return Response({"error": "File size is too large."}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        file_error = upload_error(valid_file)
+        if file_error:
+            return Response({"error": file_error[0]}, status=file_error[1])
   ########## END FILE PROCESSING
 
-  ########## BEGIN TEXT PROCESSING
-        image_text = read_receipt(valid_file)
-      
-        if not image_text["success"]:
-            return Response({"error": "Unable to convert image to text, please try again later."}, status=status.HTTP_400_BAD_REQUEST)
+        # OCR and parsing happen in a background worker; clients poll the status endpoint
+        receipt = create_pending_receipt(request.user, valid_file)
 
-        text = image_text["data"]
-        
-        receipt_parser = ReceiptParser()
-    
-        subtotal, tax, total = receipt_parser.extract_totals(text)
-        
-        receipt_input = {
-            "name": "Unnamed Receipt",
-            "store": receipt_parser.extract_store_name(text),
-            "address": receipt_parser.extract_address(text),
-            "date_purchased": receipt_parser.extract_date(text),
-            "subtotal": subtotal,
-            "tax": tax,
-            "taxpercent": tax / total if total != 0 else 0,
-            "total": total,
-            
-            "items": receipt_parser.extract_items(text)
-        }
-        receipt_input["num_items"] = len(receipt_input["items"])
-  ########## END TEXT PROCESSING
+        return Response({"receipt_uuid": receipt.receipt_uuid, "processing_state": receipt.processing_state}, status=status.HTTP_202_ACCEPTED)
     
-        receipt = ReceiptSerializer(data = receipt_input, context={"request": request})
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS) 
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        if not receipt.is_valid():
-            return Response({"error": "Invalid receipt data, please try again later."}, status=status.HTTP_400_BAD_REQUEST)
 
-        receipt.save()
+@api_view(["POST"])
+@parser_classes([MultiPartParser, FormParser])
+@ratelimit(key="ip", rate="1/10s", block=True)
+def bulk_create_receipts(request):
+    try:
+        if not request.user.is_authenticated:
+            return Response({"error": "Please log in."}, status=status.HTTP_401_UNAUTHORIZED)
+
+        uploads = request.FILES.getlist("files")
+        if not uploads:
+            return Response({"error": "No existing file"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(uploads) > settings.RECEIPT_BULK_MAX_FILES:
+            return Response({"error": f"Upload at most {settings.RECEIPT_BULK_MAX_FILES} files at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [{"file": upload.name} for upload in uploads]
+        accepted = []
+        for result, upload in zip(results, uploads):
+            file_error = upload_error(upload)
+            if file_error:
+                result["error"] = file_error[0]
+            else:
+                accepted.append((result, upload))
+
+        # OCR and parse every file at once, then save the ones that worked together
+        parsed = parse_uploads([upload for _, upload in accepted])
+
+        parsed_receipts = []
+        saved_results = []
+        for (result, _), (parsed_receipt, error) in zip(accepted, parsed):
+            if error:
+                result["error"] = error
+            else:
+                parsed_receipts.append(parsed_receipt)
+                saved_results.append(result)
+
+        receipts = save_parsed_receipts(request.user, parsed_receipts, batch_size=settings.RECEIPT_BULK_BATCH_SIZE)
+        for result, receipt in zip(saved_results, receipts):
+            result["receipt_uuid"] = receipt.receipt_uuid
+            result["num_items"] = receipt.num_items
+
+        return Response({"created": len(receipts), "results": results}, status=status.HTTP_200_OK)
 
-        request.user.num_receipts = Receipt.objects.filter(user = request.user).count()
-        request.user.save()
-        return Response(receipt.data,status=status.HTTP_201_CREATED)
-    
     except Ratelimited:
-        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS) 
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
     except Exception as e:
         print(str(e))
         return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -155,3 +183,40 @@ def receipt_view(request, receipt_id):
     except Exception as e:
         print(str(e))
         return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@ratelimit(key="ip", rate="5/s", block=True)
+def receipt_status(request, receipt_id):
+    try:
+        if not request.user.is_authenticated:
+            return Response({"error": "Please log in."}, status=status.HTTP_401_UNAUTHORIZED)
+
+        receipt = Receipt.objects.get(receipt_uuid = receipt_id)
+        if receipt.user != request.user:
+            return Response({"error": "Not authorized to access this receipt"}, status=status.HTTP_403_FORBIDDEN)
+
+        return Response({
+            "receipt_uuid": receipt.receipt_uuid,
+            "processing_state": receipt.processing_state,
+            "processing_error": receipt.processing_error,
+        }, status=status.HTTP_200_OK)
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except Receipt.DoesNotExist:
+        return Response({"error": "Receipt not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@ratelimit(key="ip", rate="5/s", block=True)
+def ocr_stats(request):
+    try:
+        return Response({**ocrcache.stats(), "client": get_ocr_backend().stats()}, status=status.HTTP_200_OK)
+    except Ratelimited:
+        return Response({"error": "Too many requests, please slow down."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except Exception as e:
+        print(str(e))
+        return Response({"error": "Internal server error, please try again later."},status=status.HTTP_500_INTERNAL_SERVER_ERROR)